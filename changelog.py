@@ -0,0 +1,95 @@
+"""
+Change feed of the rows touched by each sync run.
+
+Every upsert writes one 'sync_changelog' row per inserted or updated record, in the same
+statement as the upsert itself. Downstream jobs can then refresh only what changed, e.g.
+
+    SELECT DISTINCT table_name, corporate_number FROM sync_changelog WHERE id > :last_seen_id
+"""
+import uuid
+from datetime import datetime
+
+CHANGELOG_TABLE = "sync_changelog"
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_COMPACT_AFTER_DAYS = 7
+
+
+def new_run_id():
+    return f"{ datetime.now().strftime('%Y%m%dT%H%M%S') }-{ uuid.uuid4().hex[:8] }"
+
+
+def ensure_changelog_table(engine):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS { CHANGELOG_TABLE } (
+                id BIGSERIAL PRIMARY KEY,
+                run_id TEXT,
+                table_name TEXT NOT NULL,
+                corporate_number TEXT,
+                pk JSONB NOT NULL,
+                op TEXT NOT NULL CHECK (op IN ('insert', 'update')),
+                changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS { CHANGELOG_TABLE }_changed_at_idx ON { CHANGELOG_TABLE } (changed_at)"))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS { CHANGELOG_TABLE }_key_idx ON { CHANGELOG_TABLE } (table_name, corporate_number)"))
+
+
+def append_changes_sql(pk_list):
+    """
+    Final statement of an upsert whose CTE 'upserted' returns is_insert, corporate_number and
+    the pk columns: appends those rows to the changelog and yields one 'is_insert' per row.
+    Binds :run_id and :table_name.
+    """
+    pk_json = ", ".join(f"'{ c }', \"{ c }\"" for c in pk_list)
+
+    return f"""
+        INSERT INTO { CHANGELOG_TABLE } (run_id, table_name, corporate_number, pk, op)
+        SELECT :run_id, :table_name, corporate_number, jsonb_build_object({ pk_json }),
+               CASE WHEN is_insert THEN 'insert' ELSE 'update' END
+        FROM upserted
+        RETURNING (op = 'insert') AS is_insert;
+    """
+
+
+def compact_changelog(engine, older_than_days=DEFAULT_COMPACT_AFTER_DAYS):
+    """
+    Keeps only the latest entry per (table, pk) among entries older than the threshold.
+    The survivor becomes an 'insert' if any collapsed entry was one. Returns rows removed.
+    """
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TEMP TABLE changelog_ranked ON COMMIT DROP AS
+            SELECT id,
+                   row_number() OVER w AS rn,
+                   bool_or(op = 'insert') OVER (PARTITION BY table_name, pk) AS any_insert
+            FROM { CHANGELOG_TABLE }
+            WHERE changed_at < now() - make_interval(days => :days)
+            WINDOW w AS (PARTITION BY table_name, pk ORDER BY id DESC)
+        """), { "days": older_than_days })
+        conn.execute(text(f"""
+            UPDATE { CHANGELOG_TABLE } c SET op = 'insert'
+            FROM changelog_ranked r
+            WHERE c.id = r.id AND r.rn = 1 AND r.any_insert AND c.op <> 'insert'
+        """))
+        result = conn.execute(text(f"""
+            DELETE FROM { CHANGELOG_TABLE } c USING changelog_ranked r
+            WHERE c.id = r.id AND r.rn > 1
+        """))
+        return result.rowcount
+
+
+def prune_changelog(engine, retention_days=DEFAULT_RETENTION_DAYS):
+    """Deletes entries past the retention window. Returns rows removed."""
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(f"DELETE FROM { CHANGELOG_TABLE } WHERE changed_at < now() - make_interval(days => :days)"),
+            { "days": retention_days }
+        )
+        return result.rowcount
@@ -212,4 +212,93 @@ MAPPING_CONFIG = {
         "workplace_info.compatibility_of_childcare_and_work.paternity_leave_acquisition_num": "taking_childcare_leave_male",
         "workplace_info.compatibility_of_childcare_and_work.maternity_leave_acquisition_num": "taking_childcare_leave_female"
     }
-}
\ No newline at end of file
+}
+
+# Conflict keys used by the upsert. Tables not listed fall back to 'corporate_number'.
+# schema.py creates a unique index on each of these (plus partition_date on partitioned tables).
+PK_MAP = {
+    "patent_information_gbizinfo": "corporate_number, application_number",
+    "notification_certification_information_gbizinfo": "corporate_number, notification_certification",
+    "award_information_gbizinfo": "corporate_number, award_name",
+    "financial_information_gbizinfo": "corporate_number, fiscal_period",
+    "subsidy_information_gbizinfo": "corporate_number, subsidy",
+    "procurement_information_gbizinfo": "corporate_number, project_name"
+}
+
+# Largest number of flattened rows parsed and upserted at once; longer pages (or child lists) are split
+MAX_BATCH_ROWS = 5000
+
+# When a page repeats a conflict key, the row with the latest value here wins (then the last one on the page)
+UPDATED_AT_COLUMN = "last_updated_date"
+
+# Monetary metrics that get a canonical '<metric>_yen' column next to the raw value and its '<metric>_unit'
+YEN_METRICS = {
+    "financial_information_gbizinfo": [
+        "net_sales", "operating_revenue", "operating_income", "total_operating_revenue",
+        "ordinary_revenue", "net_premiums_written", "ordinary_profit_or_loss",
+        "net_income_or_loss", "capital_stock", "net_assets", "total_assets"
+    ]
+}
+
+# Yen multiplier for each '*_unit_ref' value. Unknown units leave the '_yen' column empty.
+UNIT_MULTIPLIERS = {
+    "円": 1,
+    "JPY": 1,
+    "千円": 1_000,
+    "百万円": 1_000_000,
+    "億円": 100_000_000,
+    "十億円": 1_000_000_000
+}
+
+# Column types other than TEXT, per table (values are cast on upsert).
+# Columns listed here but not in MAPPING_CONFIG are derived during parsing.
+COLUMN_TYPES = {
+    "patent_information_gbizinfo": { "application_date": "DATE" },
+    "procurement_information_gbizinfo": { "order_date": "DATE" },
+    "financial_information_gbizinfo": { f"{ m }_yen": "NUMERIC" for m in YEN_METRICS["financial_information_gbizinfo"] }
+}
+
+# Plain (non-unique) indexes, one per column, for columns that consumers filter or aggregate on
+SECONDARY_INDEXES = {
+    "financial_information_gbizinfo": [ "net_sales_yen", "ordinary_profit_or_loss_yen", "total_assets_yen" ]
+}
+
+# Fast-growing tables, range-partitioned by year on this date column (through a derived, non-null
+# 'partition_date', so the date can be missing or corrected without changing the row's key)
+PARTITION_CONFIG = {
+    "patent_information_gbizinfo": "application_date",
+    "procurement_information_gbizinfo": "order_date"
+}
+PARTITION_START_YEAR = 2000
+
+# Order in which tables are synced when a run has a time budget: whatever is left over is resumed next run
+TABLE_PRIORITY = [
+    "corporate_basic_information_gbizinfo",
+    "financial_information_gbizinfo",
+    "subsidy_information_gbizinfo",
+    "procurement_information_gbizinfo",
+    "notification_certification_information_gbizinfo",
+    "award_information_gbizinfo",
+    "workplace_information_gbizinfo",
+    "patent_information_gbizinfo"
+]
+
+# Data-quality rules checked on every parsed batch (see quality.py). Tables not listed require
+# their conflict key columns in every row; rows that break this go to the dead-letter queue
+# one by one while the rest of the batch loads.
+#   required: columns that must be non-NULL/non-empty in a row
+#   max_reject_rate: max share of a batch's rows that may be rejected (None = no limit)
+#   max_duplicate_rate: max share of rows repeating a conflict key (None = no limit; they are collapsed anyway)
+#   action: when a batch goes over a limit, 'warn' (log it, default) or 'fail' (abort the table)
+QUALITY_RULES = {
+    "corporate_basic_information_gbizinfo": {
+        "required": [ "corporate_number", "corporate_name" ],
+        # Most of a batch without names means the API or the mapping changed
+        "max_reject_rate": 0.5,
+        "action": "fail"
+    },
+    "financial_information_gbizinfo": {
+        "required": [ "corporate_number", "fiscal_period" ],
+        "max_duplicate_rate": 0.5
+    }
+}
@@ -0,0 +1,131 @@
+"""
+Wide 'corporate_profile' summary table: one row per corporation with its identity, latest
+financials and counts/sums from the child tables, so dashboards don't have to join eight tables.
+
+It is refreshed at the end of each sync, only for the corporate numbers that run touched
+(taken from the change feed), and can be rebuilt in full with 'refresh-profile --all'.
+"""
+from changelog import CHANGELOG_TABLE
+
+PROFILE_TABLE = "corporate_profile"
+
+# Casts text or numeric columns to numeric, ignoring values that aren't plain numbers
+NUMERIC = r"CASE WHEN ({ col })::text ~ '^\s*-?[0-9]+(\.[0-9]+)?\s*$' THEN ({ col })::text::numeric END"
+
+
+def numeric(col):
+    return NUMERIC.replace("{ col }", col)
+
+
+def ensure_profile_table(engine):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS { PROFILE_TABLE } (
+                corporate_number TEXT PRIMARY KEY,
+                corporate_name TEXT,
+                headquarters_address TEXT,
+                status TEXT,
+                capital TEXT,
+                employees TEXT,
+                latest_fiscal_period TEXT,
+                latest_fiscal_year TEXT,
+                latest_net_sales TEXT,
+                latest_net_sales_unit TEXT,
+                latest_ordinary_profit_or_loss TEXT,
+                latest_ordinary_profit_or_loss_unit TEXT,
+                latest_net_income_or_loss TEXT,
+                latest_net_income_or_loss_unit TEXT,
+                latest_total_assets TEXT,
+                latest_total_assets_unit TEXT,
+                subsidy_count INTEGER NOT NULL DEFAULT 0,
+                subsidy_amount_total NUMERIC,
+                procurement_count INTEGER NOT NULL DEFAULT 0,
+                procurement_amount_total NUMERIC,
+                patent_count INTEGER NOT NULL DEFAULT 0,
+                award_count INTEGER NOT NULL DEFAULT 0,
+                certification_count INTEGER NOT NULL DEFAULT 0,
+                refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """))
+
+
+def _refresh_sql(touched_sql):
+    profile_cols = [
+        "corporate_name", "headquarters_address", "status", "capital", "employees",
+        "latest_fiscal_period", "latest_fiscal_year",
+        "latest_net_sales", "latest_net_sales_unit",
+        "latest_ordinary_profit_or_loss", "latest_ordinary_profit_or_loss_unit",
+        "latest_net_income_or_loss", "latest_net_income_or_loss_unit",
+        "latest_total_assets", "latest_total_assets_unit",
+        "subsidy_count", "subsidy_amount_total", "procurement_count", "procurement_amount_total",
+        "patent_count", "award_count", "certification_count"
+    ]
+    update_stmt = ", ".join(f"{ c } = EXCLUDED.{ c }" for c in profile_cols)
+
+    return f"""
+        WITH touched AS ({ touched_sql })
+        INSERT INTO { PROFILE_TABLE } (corporate_number, { ", ".join(profile_cols) }, refreshed_at)
+        SELECT
+            t.corporate_number,
+            b.corporate_name, b.headquarters_address, b.status, b.capital, b.employees,
+            f.fiscal_period, f.fiscal_year,
+            f.net_sales, f.net_sales_unit,
+            f.ordinary_profit_or_loss, f.ordinary_profit_or_loss_unit,
+            f.net_income_or_loss, f.net_income_or_loss_unit,
+            f.total_assets, f.total_assets_unit,
+            coalesce(s.cnt, 0), s.total,
+            coalesce(p.cnt, 0), p.total,
+            coalesce(pt.cnt, 0),
+            coalesce(a.cnt, 0),
+            coalesce(c.cnt, 0),
+            now()
+        FROM touched t
+        LEFT JOIN corporate_basic_information_gbizinfo b ON b.corporate_number = t.corporate_number
+        LEFT JOIN LATERAL (
+            SELECT fiscal_period, fiscal_year, net_sales, net_sales_unit,
+                   ordinary_profit_or_loss, ordinary_profit_or_loss_unit,
+                   net_income_or_loss, net_income_or_loss_unit, total_assets, total_assets_unit
+            FROM financial_information_gbizinfo
+            WHERE corporate_number = t.corporate_number
+            ORDER BY fiscal_period DESC NULLS LAST
+            LIMIT 1
+        ) f ON true
+        LEFT JOIN LATERAL (
+            SELECT count(*) AS cnt, sum({ numeric("amount") }) AS total
+            FROM subsidy_information_gbizinfo WHERE corporate_number = t.corporate_number
+        ) s ON true
+        LEFT JOIN LATERAL (
+            SELECT count(*) AS cnt, sum({ numeric("amount") }) AS total
+            FROM procurement_information_gbizinfo WHERE corporate_number = t.corporate_number
+        ) p ON true
+        LEFT JOIN LATERAL (
+            SELECT count(*) AS cnt FROM patent_information_gbizinfo WHERE corporate_number = t.corporate_number
+        ) pt ON true
+        LEFT JOIN LATERAL (
+            SELECT count(*) AS cnt FROM award_information_gbizinfo WHERE corporate_number = t.corporate_number
+        ) a ON true
+        LEFT JOIN LATERAL (
+            SELECT count(*) AS cnt FROM notification_certification_information_gbizinfo WHERE corporate_number = t.corporate_number
+        ) c ON true
+        ON CONFLICT (corporate_number) DO UPDATE SET { update_stmt }, refreshed_at = EXCLUDED.refreshed_at
+    """
+
+
+def refresh_profiles(engine, run_id=None):
+    """
+    Recomputes profile rows for the corporate numbers touched by 'run_id'
+    (every corporation in corporate_basic_information_gbizinfo when run_id is None).
+    Returns the number of profiles written.
+    """
+    from sqlalchemy import text
+
+    if run_id is None:
+        touched_sql = "SELECT DISTINCT corporate_number FROM corporate_basic_information_gbizinfo WHERE corporate_number IS NOT NULL"
+    else:
+        touched_sql = f"SELECT DISTINCT corporate_number FROM { CHANGELOG_TABLE } WHERE run_id = :run_id AND corporate_number IS NOT NULL"
+
+    with engine.begin() as conn:
+        result = conn.execute(text(_refresh_sql(touched_sql)), { "run_id": run_id })
+        return result.rowcount
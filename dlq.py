@@ -0,0 +1,131 @@
+"""
+Dead-letter queue of pages and records that failed to sync, kept in the target database
+('sync_dead_letters') next to 'sync_runs' and 'sync_progress', so a later run on a fresh
+checkout (the scheduled runner) can replay them with 'retry-dlq'.
+"""
+import json
+import threading
+
+DLQ_TABLE = "sync_dead_letters"
+# Longest error text kept per entry
+MAX_ERROR_CHARS = 2000
+
+
+def ensure_dlq_table(engine):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS { DLQ_TABLE } (
+                id BIGSERIAL PRIMARY KEY,
+                run_id TEXT,
+                kind TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                endpoint TEXT,
+                from_date TEXT,
+                to_date TEXT,
+                page INTEGER,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                payload JSONB,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                last_attempt_at TIMESTAMPTZ
+            )
+        """))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS { DLQ_TABLE }_table_idx ON { DLQ_TABLE } (table_name, id)"))
+
+
+class DeadLetterQueue:
+    """
+    Failed work of a run. Each entry keeps enough context (endpoint, date window, page, raw
+    record) to be retried on its own. '.counts' holds the entries added by this run per table.
+    """
+
+    def __init__(self, engine, run_id=None):
+        self.engine = engine
+        self.run_id = run_id
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, kind, table_name, endpoint_suffix, from_date, to_date, page, error, payload=None, attempts=1):
+        """
+        kind is 'window' (the first page of a window could not be fetched, so the rest of
+        the window from 'page' on is missing), 'page' (a later API page could not be fetched),
+        'record' (one hojin-info failed to load), 'row' (one parsed row failed its table's
+        data-quality rules; see add_rows) or 'sink' (an extra target failed to write a batch;
+        payload is the target name and the batch's rows).
+        """
+        from sqlalchemy import text
+
+        entry = {
+            "run_id": self.run_id, "kind": kind, "table_name": table_name, "endpoint": endpoint_suffix,
+            "from_date": from_date, "to_date": to_date, "page": page, "error": str(error)[:MAX_ERROR_CHARS],
+            "attempts": attempts,
+            "payload": None if payload is None else json.dumps(payload, ensure_ascii=False, default=str)
+        }
+        with self.engine.begin() as conn:
+            entry["id"] = conn.execute(text(f"""
+                INSERT INTO { DLQ_TABLE } (run_id, kind, table_name, endpoint, from_date, to_date, page, error, attempts, payload)
+                VALUES (:run_id, :kind, :table_name, :endpoint, :from_date, :to_date, :page, :error, :attempts, CAST(:payload AS JSONB))
+                RETURNING id
+            """), entry).scalar()
+        with self._lock:
+            self.counts[table_name] = self.counts.get(table_name, 0) + 1
+        return entry
+
+    def add_rows(self, table_name, endpoint_suffix, from_date, to_date, page, rows, reasons):
+        """Adds one 'row' entry per rejected row (a DataFrame) with its reason, in one statement."""
+        from sqlalchemy import text
+
+        if rows.empty:
+            return
+        records = rows.astype(object).where(rows.notna(), None).to_dict("records")
+        entries = [
+            { "run_id": self.run_id, "kind": "row", "table_name": table_name, "endpoint": endpoint_suffix,
+              "from_date": from_date, "to_date": to_date, "page": page, "error": str(reason)[:MAX_ERROR_CHARS],
+              "attempts": 1, "payload": json.dumps(record, ensure_ascii=False, default=str) }
+            for record, reason in zip(records, reasons)
+        ]
+        with self.engine.begin() as conn:
+            conn.execute(text(f"""
+                INSERT INTO { DLQ_TABLE } (run_id, kind, table_name, endpoint, from_date, to_date, page, error, attempts, payload)
+                VALUES (:run_id, :kind, :table_name, :endpoint, :from_date, :to_date, :page, :error, :attempts, CAST(:payload AS JSONB))
+            """), entries)
+        with self._lock:
+            self.counts[table_name] = self.counts.get(table_name, 0) + len(entries)
+
+    def load(self, tables=None):
+        """Entries of the given tables (all without), oldest first."""
+        from sqlalchemy import text
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(f"""
+                SELECT id, kind, table_name, endpoint, from_date, to_date, page, error, attempts, payload
+                FROM { DLQ_TABLE }
+                WHERE CAST(:tables AS TEXT[]) IS NULL OR table_name = ANY(:tables)
+                ORDER BY id
+            """), { "tables": list(tables) if tables else None }).mappings().all()
+
+        return [
+            { "id": r["id"], "kind": r["kind"], "table": r["table_name"], "endpoint": r["endpoint"],
+              "from": r["from_date"], "to": r["to_date"], "page": r["page"], "error": r["error"],
+              "attempts": r["attempts"], "payload": r["payload"] }
+            for r in rows
+        ]
+
+    def settle(self, succeeded_ids, failed):
+        """
+        After a retry: deletes succeeded entries and bumps the attempt count of the ones in
+        'failed' ({ id: error }). Returns the number of entries left.
+        """
+        from sqlalchemy import text
+
+        with self.engine.begin() as conn:
+            if succeeded_ids:
+                conn.execute(text(f"DELETE FROM { DLQ_TABLE } WHERE id = ANY(:ids)"), { "ids": list(succeeded_ids) })
+            if failed:
+                conn.execute(text(f"""
+                    UPDATE { DLQ_TABLE } SET attempts = attempts + 1, error = :error, last_attempt_at = now()
+                    WHERE id = :id
+                """), [ { "id": i, "error": str(e)[:MAX_ERROR_CHARS] } for i, e in failed.items() ])
+            return conn.execute(text(f"SELECT count(*) FROM { DLQ_TABLE }")).scalar()
@@ -0,0 +1,141 @@
+"""
+Per-table run history ('sync_runs') and throughput regression checks.
+
+Every sync/replay/backfill run appends one row per table. Before it does, each table's
+rows/second is compared with the median of its recent runs, and drops beyond the
+threshold are flagged in summary.md.
+"""
+import json
+import time
+from contextlib import contextmanager
+from statistics import median
+
+import quality
+
+HISTORY_TABLE = "sync_runs"
+DEFAULT_BASELINE_RUNS = 7
+DEFAULT_REGRESSION_THRESHOLD = 0.3
+# Runs that processed fewer rows than this are too noisy to compare
+MIN_ROWS_FOR_BASELINE = 100
+
+
+def new_stats():
+    return { "pages": 0, "rows": 0, "collapsed": 0, "bytes": 0, "stage_seconds": {}, "quality": quality.new_stats() }
+
+
+@contextmanager
+def timed(stats, stage):
+    """Adds the wall time of the block to stats['stage_seconds'][stage] (no-op without stats)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stages = stats["stage_seconds"]
+            stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - start
+
+
+def throughput(item):
+    duration = item.get("duration") or 0
+    return item.get("rows", 0) / duration if duration > 0 else None
+
+
+def ensure_history_table(engine):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS { HISTORY_TABLE } (
+                id BIGSERIAL PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                command TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                from_date TEXT,
+                to_date TEXT,
+                status TEXT,
+                duration_seconds DOUBLE PRECISION,
+                pages INTEGER,
+                rows INTEGER,
+                collapsed INTEGER,
+                inserted INTEGER,
+                updated INTEGER,
+                dead_letters INTEGER,
+                bytes BIGINT,
+                stage_seconds JSONB,
+                finished_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """))
+        conn.execute(text(f"ALTER TABLE { HISTORY_TABLE } ADD COLUMN IF NOT EXISTS collapsed INTEGER"))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS { HISTORY_TABLE }_table_idx ON { HISTORY_TABLE } (table_name, finished_at DESC)"))
+
+
+def record_run(engine, run_id, command, from_date, to_date, report_data):
+    from sqlalchemy import text
+
+    rows = [
+        {
+            "run_id": run_id, "command": command, "table_name": item["table"],
+            "from_date": from_date, "to_date": to_date, "status": item["status"],
+            "duration_seconds": item.get("duration"), "pages": item.get("pages"), "rows": item.get("rows"),
+            "collapsed": item.get("collapsed"), "inserted": item["inserted"], "updated": item["updated"], "dead_letters": item.get("dead_letters", 0),
+            "bytes": item.get("bytes"), "stage_seconds": json.dumps(item.get("stage_seconds", {}))
+        }
+        for item in report_data
+    ]
+    if not rows:
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            INSERT INTO { HISTORY_TABLE } (run_id, command, table_name, from_date, to_date, status, duration_seconds,
+                                           pages, rows, collapsed, inserted, updated, dead_letters, bytes, stage_seconds)
+            VALUES (:run_id, :command, :table_name, :from_date, :to_date, :status, :duration_seconds,
+                    :pages, :rows, :collapsed, :inserted, :updated, :dead_letters, :bytes, CAST(:stage_seconds AS JSONB))
+        """), rows)
+
+
+def load_baselines(engine, tables, command, runs=DEFAULT_BASELINE_RUNS):
+    """
+    { table: median rows/second over its last 'runs' comparable runs }. Only runs of the same
+    command compare: a replay reads pages from disk and is far faster than a sync.
+    """
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        result = conn.execute(text(f"""
+            SELECT table_name, rows / duration_seconds AS rps
+            FROM (
+                SELECT table_name, rows, duration_seconds,
+                       row_number() OVER (PARTITION BY table_name ORDER BY finished_at DESC) AS rn
+                FROM { HISTORY_TABLE }
+                WHERE table_name = ANY(:tables) AND command = :command AND status <> '❌ Error'
+                  AND rows >= :min_rows AND duration_seconds > 0
+            ) recent
+            WHERE rn <= :runs
+        """), { "tables": list(tables), "command": command, "min_rows": MIN_ROWS_FOR_BASELINE, "runs": runs })
+
+        samples = {}
+        for table_name, rps in result:
+            samples.setdefault(table_name, []).append(rps)
+
+    return { t: median(v) for t, v in samples.items() }
+
+
+def flag_regressions(report_data, baselines, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Adds 'baseline_rps', 'rps_change' and 'regressed' to each report row. Returns the regressed tables."""
+    regressed = []
+    for item in report_data:
+        current = throughput(item)
+        baseline = baselines.get(item["table"])
+        item["baseline_rps"] = baseline
+        item["rps_change"] = None
+        item["regressed"] = False
+
+        if current is None or not baseline or item.get("rows", 0) < MIN_ROWS_FOR_BASELINE:
+            continue
+
+        item["rps_change"] = current / baseline - 1
+        if item["rps_change"] < -threshold:
+            item["regressed"] = True
+            regressed.append(item["table"])
+    return regressed
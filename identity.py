@@ -0,0 +1,80 @@
+"""
+Run-scoped corporate identity cache (corporate_number -> name, location).
+
+Child endpoints repeat each corporation's name and location on every flattened row
+(json_normalize 'meta') and MAPPING_CONFIG copies them into two columns each. With a cache,
+child rows are parsed with corporate_number only and the identity columns are attached
+with one vectorized map per batch, just before load. The cache is filled from the
+hojin-info headers of every page (one entry per corporation, not per row) and, for
+corporations whose header has neither, in bulk from corporate_basic_information_gbizinfo.
+"""
+import threading
+
+from config import MAPPING_CONFIG
+
+# hojin-info keys served from the cache instead of json_normalize meta
+IDENTITY_FIELDS = ("name", "location")
+BASIC_TABLE = "corporate_basic_information_gbizinfo"
+
+
+class IdentityCache:
+
+    def __init__(self):
+        self.values = { field: {} for field in IDENTITY_FIELDS }
+        self.loaded = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(set().union(*self.values.values()))
+
+    def remember(self, hojin_infos):
+        """Caches the identity fields of each hojin-info that has any of them."""
+        found = [
+            (record["corporate_number"], [ record.get(f) for f in IDENTITY_FIELDS ]) for record in hojin_infos
+            if record.get("corporate_number") is not None and any(record.get(f) for f in IDENTITY_FIELDS)
+        ]
+        with self._lock:
+            for number, values in found:
+                for field, value in zip(IDENTITY_FIELDS, values):
+                    self.values[field][number] = value
+
+    def load_missing(self, engine, corporate_numbers):
+        """Bulk-loads identities of uncached corporations from the basic table (each asked for once per run)."""
+        from sqlalchemy import text
+
+        names = self.values["name"]
+        with self._lock:
+            missing = { n for n in corporate_numbers.dropna().unique() if n not in names and n not in self.loaded }
+            self.loaded |= missing
+        if not missing:
+            return
+
+        with engine.connect() as conn:
+            rows = conn.execute(text(f"""
+                SELECT corporate_number, corporate_name, headquarters_address FROM { BASIC_TABLE }
+                WHERE corporate_number = ANY(:numbers)
+            """), { "numbers": list(missing) }).all()
+
+        with self._lock:
+            for number, name, location in rows:
+                self.values["name"][number] = name
+                self.values["location"][number] = location
+
+    def attach(self, table_name, df):
+        """Adds the identity columns MAPPING_CONFIG maps 'name'/'location' to, by corporate_number."""
+        if "corporate_number" not in df.columns:
+            return df
+
+        m_cfg = MAPPING_CONFIG[table_name]
+        columns = {}
+        for field in IDENTITY_FIELDS:
+            targets = m_cfg.get(field)
+            if not targets:
+                continue
+            # Series.map iterates the dict, so it must not run while another table's thread writes to it
+            with self._lock:
+                mapped = df["corporate_number"].map(self.values[field])
+            for col in targets if isinstance(targets, list) else [ targets ]:
+                columns[col] = mapped
+        return df.assign(**columns)
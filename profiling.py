@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Sampling interval for the collapsed-stack sampler (seconds)
+SAMPLE_INTERVAL = 0.005
+# Number of allocation sites listed per table report
+TOP_ALLOCATIONS = 25
+# Frames kept per traced allocation; the reports only group by the allocating line
+TRACEBACK_FRAMES = 1
+
+
+class NullProfiler:
+    """Drop-in profiler used when --profile is off. Every stage is a no-op."""
+    enabled = False
+
+    def stage(self, table_name, stage_name):
+        return nullcontext()
+
+    def table(self, table_name):
+        return nullcontext()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        return []
+
+
+class SyncProfiler:
+    """
+    Opt-in profiler scoped per (table, stage).
+    Collects cProfile stats, sampled collapsed stacks (flamegraph.pl / speedscope ready) and
+    the peak traced memory per (table, stage), plus one tracemalloc allocation diff per table,
+    then writes them to the artifacts directory. Stages wrap every batch, so they only read
+    tracemalloc's counters; snapshots (which walk the whole traced heap) are taken per table.
+    """
+    enabled = True
+
+    def __init__(self, artifacts_dir, interval=SAMPLE_INTERVAL):
+        self.artifacts_dir = artifacts_dir
+        self.interval = interval
+        self.profiles = {}
+        self.stacks = {}
+        self.allocations = {}
+        self.peaks = {}
+        self.timings = Counter()
+        self._active = None
+        self._target_thread = threading.get_ident()
+        self._stop_event = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        os.makedirs(self.artifacts_dir, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+        self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+        self._sampler.start()
+
+    def _sample_loop(self):
+        while not self._stop_event.wait(self.interval):
+            key = self._active
+            if key is None: continue
+            frame = sys._current_frames().get(self._target_thread)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{ code.co_name } ({ os.path.basename(code.co_filename) }:{ code.co_firstlineno })")
+                frame = frame.f_back
+            if stack:
+                self.stacks.setdefault(key, Counter())[";".join(reversed(stack))] += 1
+
+    @contextmanager
+    def stage(self, table_name, stage_name):
+        """Profiles the wrapped block and accumulates the results under (table, stage)."""
+        key = (table_name, stage_name)
+        profile = self.profiles.setdefault(key, cProfile.Profile())
+        tracemalloc.reset_peak()
+        start_mem = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+
+        self._active = key
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._active = None
+
+            self.timings[key] += time.perf_counter() - start_time
+            peak = tracemalloc.get_traced_memory()[1] - start_mem
+            self.peaks[key] = max(self.peaks.get(key, 0), peak)
+
+    @contextmanager
+    def table(self, table_name):
+        """Accumulates the memory still allocated after the wrapped block, per allocating line, under the table."""
+        before = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            diff = tracemalloc.take_snapshot().compare_to(before, "lineno")
+            sites = self.allocations.setdefault(table_name, Counter())
+            for stat in diff:
+                if stat.size_diff > 0:
+                    sites[str(stat.traceback[0])] += stat.size_diff
+
+    def stop(self):
+        """Stops sampling, writes every artifact and returns their paths (relative to cwd)."""
+        self._stop_event.set()
+        if self._sampler:
+            self._sampler.join()
+        tracemalloc.stop()
+
+        written = []
+        for key in sorted(self.profiles):
+            base = os.path.join(self.artifacts_dir, ".".join(key))
+
+            pstats.Stats(self.profiles[key]).dump_stats(f"{ base }.pstats")
+            written.append((key, "pstats", f"{ base }.pstats"))
+
+            with open(f"{ base }.collapsed", "w", encoding="utf-8") as f:
+                for stack, count in self.stacks.get(key, Counter()).most_common():
+                    f.write(f"{ stack } { count }\n")
+            written.append((key, "collapsed stacks", f"{ base }.collapsed"))
+
+        for table_name in sorted({ k[0] for k in self.profiles } | set(self.allocations)):
+            path = os.path.join(self.artifacts_dir, f"{ table_name }.alloc.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"# { table_name }\n")
+                for key in sorted(k for k in self.profiles if k[0] == table_name):
+                    f.write(f"# { key[1] }: wall time { self.timings[key]:.3f} s, peak traced memory { self.peaks.get(key, 0) / 1024:.1f} KiB\n")
+                for site, size in self.allocations.get(table_name, Counter()).most_common(TOP_ALLOCATIONS):
+                    f.write(f"{ size / 1024:>12.1f} KiB  { site }\n")
+            written.append(((table_name, "all stages"), "top allocations", path))
+
+        return written
+
+
+def make_profiler(enabled, artifacts_dir):
+    return SyncProfiler(artifacts_dir) if enabled else NullProfiler()
@@ -0,0 +1,129 @@
+"""
+Vectorized data-quality gate for parsed batches.
+
+Each batch is checked column-wise (one isna()/== '' pass over the frame, one duplicated()
+on the key) against QUALITY_RULES before it is deduplicated and upserted. Rows with an
+empty required column are rejected one by one (the caller dead-letters them) while the
+valid rows load. Batch-level limits (share of rejected rows, repeated keys) log a warning,
+or abort the table if its rule says 'fail'. Per-table statistics are accumulated for the
+run summary: null counts per column, duplicate keys, rejected rows, and mapped columns that
+never showed up (usually a MAPPING_CONFIG typo).
+"""
+import logging
+
+from config import QUALITY_RULES
+import schema
+
+DEFAULT_ACTION = "warn"
+# Columns listed per table in the summary
+SUMMARY_COLUMNS = 5
+
+
+class DataQualityError(Exception):
+    """A batch broke a batch-level rule of a table whose action is 'fail', or rows were rejected with nowhere to send them."""
+
+    def __init__(self, table_name, problems):
+        super().__init__(f"{ table_name }: { '; '.join(problems) }")
+        self.problems = problems
+
+
+def rules_for(table_name):
+    rules = QUALITY_RULES.get(table_name, {})
+    return {
+        "required": rules.get("required", schema.conflict_key(table_name)),
+        "max_reject_rate": rules.get("max_reject_rate"),
+        "max_duplicate_rate": rules.get("max_duplicate_rate"),
+        "action": rules.get("action", DEFAULT_ACTION)
+    }
+
+
+def new_stats():
+    return { "rows": 0, "nulls": {}, "seen": set(), "duplicates": 0, "rejected": 0 }
+
+
+def _blank(df):
+    """Boolean frame: True where a value is NULL or an empty string."""
+    blank = df.isna()
+    text_cols = df.select_dtypes(include=[ "object", "string" ]).columns
+    if len(text_cols):
+        blank[text_cols] = blank[text_cols] | df[text_cols].eq("")
+    return blank
+
+
+def profile(table_name, df, blank=None):
+    """Column statistics of one batch: rows, NULL/empty count per column and repeated keys."""
+    blank = _blank(df) if blank is None else blank
+
+    keys = schema.conflict_key(table_name)
+    duplicates = 0
+    if set(keys) <= set(df.columns):
+        keyed = ~blank[keys].any(axis=1)
+        duplicates = int(df.loc[keyed, keys].duplicated().sum())
+
+    return { "rows": len(df), "nulls": blank.sum().to_dict(), "duplicates": duplicates }
+
+
+def check(table_name, df, stats=None):
+    """
+    Validates a parsed batch and adds its statistics to 'stats' (new_stats()).
+    Returns (valid rows, rejected rows, reason per rejected row). A required column missing
+    from the batch altogether rejects every row. Raises DataQualityError when the batch
+    breaks a batch-level limit and the table's action is 'fail'.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rules = rules_for(table_name)
+    blank = _blank(df)
+    batch = profile(table_name, df, blank)
+
+    empty = pd.DataFrame(
+        { c: blank[c].to_numpy() if c in df.columns else np.ones(len(df), dtype=bool) for c in rules["required"] },
+        index=df.index, columns=rules["required"]
+    )
+    rejected = empty.any(axis=1).to_numpy()
+    # 'True' cells pick their column name: "a, b, " -> "a, b"
+    reasons = "empty required column(s): " + empty[rejected].dot(empty.columns + ", ").str[:-2]
+
+    if stats is not None:
+        stats["rows"] += batch["rows"]
+        stats["duplicates"] += batch["duplicates"]
+        stats["rejected"] += int(rejected.sum())
+        stats["seen"].update(df.columns)
+        for col, n in batch["nulls"].items():
+            stats["nulls"][col] = stats["nulls"].get(col, 0) + int(n)
+
+    problems = []
+    rows = max(batch["rows"], 1)
+    max_reject = rules["max_reject_rate"]
+    if max_reject is not None and rejected.sum() / rows > max_reject:
+        problems.append(f"{ int(rejected.sum()) } of { batch['rows'] } rows rejected ({ rejected.sum() / rows:.2%}, max { max_reject:.2%})")
+
+    max_dup = rules["max_duplicate_rate"]
+    if max_dup is not None and batch["duplicates"] / rows > max_dup:
+        problems.append(f"{ batch['duplicates'] } repeated key(s) in { batch['rows'] } rows "
+                        f"({ batch['duplicates'] / rows:.2%}, max { max_dup:.2%})")
+
+    if problems:
+        if rules["action"] == "fail":
+            raise DataQualityError(table_name, problems)
+        logging.warning(f"Data quality of { table_name }: { '; '.join(problems) }")
+
+    return df[~rejected], df[rejected], reasons
+
+
+def merge_stats(target, source):
+    target["rows"] += source["rows"]
+    target["duplicates"] += source["duplicates"]
+    target["rejected"] += source["rejected"]
+    target["seen"] |= source["seen"]
+    for col, n in source["nulls"].items():
+        target["nulls"][col] = target["nulls"].get(col, 0) + n
+
+
+def summarize(table_name, stats):
+    """(columns never populated, [ (column, null rate) ] highest first) for the run summary."""
+    never = [ c for c in schema.table_columns(table_name) if c not in stats["seen"] ]
+    rows = max(stats["rows"], 1)
+    rates = sorted(((c, n / rows) for c, n in stats["nulls"].items() if n), key=lambda x: -x[1])
+    return never, rates
@@ -0,0 +1,177 @@
+"""
+Sampled, Merkle-style reconciliation between cached API pages and the warehouse.
+
+Source rows (parsed from page_cache one batch at a time) are staged next to the target table, then both sides
+are hashed into buckets by corporate_number prefix. Only buckets whose hashes differ are
+split further (prefix length + 1), until the buckets are small enough; the corporations in
+those leaf buckets are the ones that drifted. The warehouse side is limited to corporations
+present in the source sample, so a partial cache never looks like mass deletion.
+
+Row hashes cover the conflict key plus every column the source provides. Because the upsert
+keeps old values where the API sends NULL (COALESCE), such rows can stay mismatched after a
+repair; they are reported, not retried.
+"""
+import random
+
+import schema
+
+# Prefix length of the buckets that are sampled; 2 digits = 100 buckets
+SAMPLE_DEPTH = 2
+MAX_DEPTH = 8
+LEAF_SIZE = 50
+
+
+def _row_text(cols):
+    return "concat_ws('|', " + ", ".join(f"coalesce(\"{ c }\"::text, '')" for c in cols) + ")"
+
+
+def _bucket_sql(relation, cols, depth, source_relation=None):
+    """Count and order-independent hash sum per corporate_number prefix of length 'depth'."""
+    restrict = f"AND corporate_number IN (SELECT corporate_number FROM { source_relation })" if source_relation else ""
+    return f"""
+        SELECT substr(corporate_number, 1, { depth }) AS bucket,
+               count(*) AS n,
+               sum(('x' || substr(md5({ _row_text(cols) }), 1, 15))::bit(60)::bigint) AS h
+        FROM { relation }
+        WHERE corporate_number IS NOT NULL
+          AND substr(corporate_number, 1, :parent_depth) = ANY(:parents)
+          { restrict }
+        GROUP BY 1
+    """
+
+
+def sample_prefixes(sample=1.0, seed=None):
+    """The corporate_number prefixes (of length SAMPLE_DEPTH) to reconcile in this run."""
+    prefixes = [ f"{ i:0{ SAMPLE_DEPTH }d}" for i in range(10 ** SAMPLE_DEPTH) ]
+    if sample < 1.0:
+        prefixes = sorted(random.Random(seed).sample(prefixes, max(1, round(len(prefixes) * sample))))
+    return prefixes
+
+
+def stage_source(engine, table_name, frames):
+    """
+    Streams the source rows (an iterable of DataFrames, oldest first) into 'rs_<table>' as text,
+    then builds the typed 'reconcile_<table>' with the last version of each conflict key.
+    Returns its name, the hashed columns (the key plus every column the source provided) and its row count.
+    """
+    from sqlalchemy import text
+
+    raw_table = f"rs_{ table_name }"
+    batch_table = f"rs_{ table_name }_batch"
+    staged = f"reconcile_{ table_name }"
+    keys = schema.conflict_key(table_name)
+    all_cols = list(dict.fromkeys([ *keys, *schema.table_columns(table_name) ]))
+    seen = set(keys)
+
+    col_defs = ", ".join(f'"{ c }" TEXT' for c in all_cols)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS { raw_table }"))
+        conn.execute(text(f"CREATE TABLE { raw_table } ({ col_defs }, _seq BIGINT)"))
+
+    seq = 0
+    for df in frames:
+        cols = [ c for c in df.columns if c in all_cols ]
+        if df.empty or not cols:
+            continue
+        seen.update(cols)
+        # Staged like the upsert stages a batch, so values reach the same text form
+        df[cols].assign(_seq=range(seq, seq + len(df))).to_sql(batch_table, engine, if_exists="replace", index=False)
+        seq += len(df)
+        cols_str = ", ".join(f'"{ c }"' for c in cols)
+        text_str = ", ".join(f'"{ c }"::text' for c in cols)
+        with engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO { raw_table } ({ cols_str }, _seq) SELECT { text_str }, _seq FROM { batch_table }"))
+
+    cols = [ c for c in all_cols if c in seen ]
+    key_str = ", ".join(f'"{ c }"' for c in keys)
+    # Rows with an empty key column never conflict, so all of them are kept
+    incomplete = " OR ".join(f"coalesce(\"{ c }\", '') = ''" for c in keys)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS { batch_table }"))
+        conn.execute(text(f"DROP TABLE IF EXISTS { staged }"))
+        conn.execute(text(f"""
+            CREATE TABLE { staged } AS
+            SELECT { ', '.join(schema.cast_expr(table_name, c, engine) for c in cols) }, _seq
+            FROM (
+                SELECT *, row_number() OVER (PARTITION BY { key_str } ORDER BY _seq DESC) AS rn FROM { raw_table }
+            ) ranked
+            WHERE rn = 1 OR { incomplete }
+        """))
+        rows = conn.execute(text(f"SELECT count(*) FROM { staged }")).scalar()
+    return staged, cols, rows
+
+
+def read_source(engine, table_name, cols, corporate_numbers, chunksize):
+    """Yields the staged source rows (as text, like a parsed batch) of the given corporations."""
+    import pandas as pd
+    from sqlalchemy import text
+
+    query = text(f"""
+        SELECT { ", ".join(f'r."{ c }"' for c in cols) }
+        FROM rs_{ table_name } r JOIN reconcile_{ table_name } s USING (_seq)
+        WHERE s.corporate_number = ANY(:numbers)
+        ORDER BY r._seq
+    """)
+    with engine.connect() as conn:
+        yield from pd.read_sql(query, conn, params={ "numbers": list(corporate_numbers) }, chunksize=chunksize)
+
+
+def drop_source(engine, table_name):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS reconcile_{ table_name }"))
+        conn.execute(text(f"DROP TABLE IF EXISTS rs_{ table_name }"))
+
+
+def find_drift(engine, table_name, staged, cols, prefixes, max_depth=MAX_DEPTH, leaf_size=LEAF_SIZE):
+    """
+    Compares the sampled prefixes and narrows mismatching buckets down to leaf buckets.
+    Returns (drifted corporate numbers from the source, stats dict).
+    """
+    from sqlalchemy import text
+
+    stats = { "buckets_compared": 0, "buckets_mismatched": 0, "leaf_buckets": 0 }
+    leaves = []
+    parents, parent_depth, depth = prefixes, SAMPLE_DEPTH, SAMPLE_DEPTH
+
+    with engine.connect() as conn:
+        while parents:
+            params = { "parents": parents, "parent_depth": parent_depth }
+            src = { r.bucket: (r.n, r.h) for r in conn.execute(text(_bucket_sql(staged, cols, depth)), params) }
+            dst = { r.bucket: (r.n, r.h) for r in conn.execute(text(_bucket_sql(table_name, cols, depth, staged)), params) }
+
+            buckets = set(src) | set(dst)
+            mismatched = sorted(b for b in buckets if src.get(b) != dst.get(b))
+            stats["buckets_compared"] += len(buckets)
+            stats["buckets_mismatched"] += len(mismatched)
+
+            split = []
+            for b in mismatched:
+                size = max(src.get(b, (0, 0))[0], dst.get(b, (0, 0))[0])
+                (split if depth < max_depth and size > leaf_size else leaves).append(b)
+
+            parents, parent_depth, depth = split, depth, depth + 1
+
+        stats["leaf_buckets"] = len(leaves)
+        if not leaves:
+            return [], stats
+
+        # Within leaf buckets, keep only corporations whose own rows differ
+        drifted = conn.execute(text(f"""
+            WITH s AS (
+                SELECT corporate_number, sum(('x' || substr(md5({ _row_text(cols) }), 1, 15))::bit(60)::bigint) AS h, count(*) AS n
+                FROM { staged } WHERE corporate_number LIKE ANY(:patterns) GROUP BY 1
+            ),
+            d AS (
+                SELECT corporate_number, sum(('x' || substr(md5({ _row_text(cols) }), 1, 15))::bit(60)::bigint) AS h, count(*) AS n
+                FROM { table_name }
+                WHERE corporate_number LIKE ANY(:patterns) AND corporate_number IN (SELECT corporate_number FROM { staged })
+                GROUP BY 1
+            )
+            SELECT s.corporate_number FROM s LEFT JOIN d USING (corporate_number)
+            WHERE d.h IS DISTINCT FROM s.h OR d.n IS DISTINCT FROM s.n
+            ORDER BY 1
+        """), { "patterns": [ f"{ b }%" for b in leaves ] }).scalars().all()
+
+    return drifted, stats
@@ -0,0 +1,178 @@
+"""
+Time-budgeted scheduling of sync work, for runs that must finish inside a CI job limit.
+
+Work is one (table, date window) at a time, taken in TABLE_PRIORITY order. Before every page
+the scheduler checks that the table's estimated seconds per page (median of recent
+'sync_runs') still fit before the deadline; otherwise the table stops cleanly between pages.
+The next page of every unfinished window is kept in 'sync_progress', so the next run
+resumes those windows first, from that page.
+"""
+import time
+from datetime import datetime, timedelta
+from statistics import median
+
+from config import TABLE_PRIORITY
+from history import HISTORY_TABLE, DEFAULT_BASELINE_RUNS
+
+PROGRESS_TABLE = "sync_progress"
+# Used for tables without history yet
+DEFAULT_PAGE_SECONDS = 5.0
+# Runs that fetch pages from the API; replays read them from disk, so they don't predict page cost
+API_COMMANDS = ("sync", "backfill")
+# Kept free at the end of the budget for profile refresh, changelog maintenance and the summary
+DEFAULT_MARGIN_SECONDS = 120
+
+
+def order_tables(tables):
+    """Most important first (TABLE_PRIORITY), the rest in their given order."""
+    rank = { t: i for i, t in enumerate(TABLE_PRIORITY) }
+    return sorted(tables, key=lambda t: rank.get(t, len(rank)))
+
+
+def ensure_progress_table(engine):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS { PROGRESS_TABLE } (
+                table_name TEXT NOT NULL,
+                from_date TEXT NOT NULL,
+                to_date TEXT NOT NULL,
+                next_page INTEGER NOT NULL,
+                run_id TEXT,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (table_name, from_date, to_date)
+            )
+        """))
+
+
+def estimate_page_seconds(engine, tables, runs=DEFAULT_BASELINE_RUNS):
+    """{ table: median seconds per page over its last 'runs' API runs that loaded pages }."""
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        result = conn.execute(text(f"""
+            SELECT table_name, duration_seconds / pages
+            FROM (
+                SELECT table_name, duration_seconds, pages,
+                       row_number() OVER (PARTITION BY table_name ORDER BY finished_at DESC) AS rn
+                FROM { HISTORY_TABLE }
+                WHERE table_name = ANY(:tables) AND command = ANY(:commands)
+                  AND status <> '❌ Error' AND pages > 0 AND duration_seconds > 0
+            ) recent
+            WHERE rn <= :runs
+        """), { "tables": list(tables), "commands": list(API_COMMANDS), "runs": runs })
+
+        samples = {}
+        for table_name, seconds in result:
+            samples.setdefault(table_name, []).append(seconds)
+
+    return { t: median(v) for t, v in samples.items() }
+
+
+def _next_day(date):
+    return (datetime.strptime(date, '%Y%m%d') + timedelta(days=1)).strftime('%Y%m%d')
+
+
+class Scheduler:
+    """
+    Deadline and progress bookkeeping shared by every table of a run (thread-safe: each
+    checkpoint is its own transaction). Without a budget it never stops work early.
+    """
+
+    def __init__(self, engine, run_id, budget_seconds=None, margin_seconds=DEFAULT_MARGIN_SECONDS, page_seconds=None):
+        self.engine = engine
+        self.run_id = run_id
+        self.deadline = time.monotonic() + budget_seconds if budget_seconds else None
+        self.margin_seconds = margin_seconds
+        self.page_seconds = page_seconds or {}
+        self.paused = set()
+
+    def remaining(self):
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def can_fetch(self, table_name):
+        """True if one more page of the table is expected to finish before the deadline (minus the margin)."""
+        if self.deadline is None:
+            return True
+        cost = self.page_seconds.get(table_name, DEFAULT_PAGE_SECONDS)
+        return self.remaining() - self.margin_seconds >= cost
+
+    def pending(self, tables):
+        """Unfinished windows of earlier runs: [ (table, from_date, to_date, next_page) ] in priority order."""
+        from sqlalchemy import text
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(f"""
+                SELECT table_name, from_date, to_date, next_page FROM { PROGRESS_TABLE }
+                WHERE table_name = ANY(:tables) ORDER BY from_date, to_date
+            """), { "tables": list(tables) }).all()
+
+        rank = { t: i for i, t in enumerate(order_tables(tables)) }
+        return sorted((tuple(r) for r in rows), key=lambda r: rank[r[0]])
+
+    def plan(self, tables, windows):
+        """
+        Ordered work: [ (window, tables, { table: start_page }) ]. Pending windows that are not
+        part of this run come first; planned windows resume from their saved page. A pending
+        window that starts like a planned one but ends on another day (the daily sync's 'to'
+        moved on) stands in for it: that table only syncs the days after the pending window.
+        """
+        tables = order_tables(tables)
+        pending = { (t, f, to): page for t, f, to, page in self.pending(tables) }
+        work = []
+
+        extra = {}
+        # (table, first day) -> last day of the longest pending window of that table starting then
+        pending_to = {}
+        for (table, from_date, to_date), page in pending.items():
+            if (from_date, to_date) not in windows:
+                extra.setdefault((from_date, to_date), {})[table] = page
+            pending_to[(table, from_date)] = max(pending_to.get((table, from_date), to_date), to_date)
+        for window, start_pages in extra.items():
+            work.append((window, order_tables(start_pages), start_pages))
+
+        for window in windows:
+            start_pages = { t: pending[(t, *window)] for t in tables if (t, *window) in pending }
+            covered = {}
+            for t in tables:
+                if t in start_pages or (t, window[0]) not in pending_to:
+                    continue
+                # Follow pending windows that continue each other (yesterday's rest, paused again)
+                last = pending_to[(t, window[0])]
+                while (t, _next_day(last)) in pending_to and last < window[1]:
+                    last = pending_to[(t, _next_day(last))]
+                covered[t] = last
+
+            planned = [ t for t in tables if t not in covered ]
+            if planned:
+                work.append((window, planned, start_pages))
+            rest = {}
+            for t, last in covered.items():
+                if last < window[1]:
+                    rest.setdefault(_next_day(last), []).append(t)
+            for from_date, rest_tables in sorted(rest.items()):
+                work.append(((from_date, window[1]), rest_tables, {}))
+        return work
+
+    def checkpoint(self, table_name, from_date, to_date, next_page, paused=False):
+        from sqlalchemy import text
+
+        with self.engine.begin() as conn:
+            conn.execute(text(f"""
+                INSERT INTO { PROGRESS_TABLE } (table_name, from_date, to_date, next_page, run_id, updated_at)
+                VALUES (:table_name, :from_date, :to_date, :next_page, :run_id, now())
+                ON CONFLICT (table_name, from_date, to_date)
+                DO UPDATE SET next_page = EXCLUDED.next_page, run_id = EXCLUDED.run_id, updated_at = now()
+            """), { "table_name": table_name, "from_date": from_date, "to_date": to_date,
+                    "next_page": next_page, "run_id": self.run_id })
+        if paused:
+            self.paused.add((table_name, from_date, to_date))
+
+    def done(self, table_name, from_date, to_date):
+        from sqlalchemy import text
+
+        with self.engine.begin() as conn:
+            conn.execute(text(f"""
+                DELETE FROM { PROGRESS_TABLE } WHERE table_name = :table_name AND from_date = :from_date AND to_date = :to_date
+            """), { "table_name": table_name, "from_date": from_date, "to_date": to_date })
@@ -0,0 +1,307 @@
+"""
+Creates and migrates the *_gbizinfo tables from MAPPING_CONFIG and the key/type/partition
+settings in config.py, so the upsert's ON CONFLICT always has a matching unique index.
+
+Only missing pieces are created, so running it before every sync is cheap and takes no
+locks on an up-to-date schema. Converting an existing plain table into a partitioned one
+copies all of its rows and only happens with 'migrate --repartition'.
+
+Partitioned tables keep their logical conflict key from PK_MAP. Postgres requires the
+partition column in every unique index, so they are partitioned on a derived, non-null
+'partition_date' (the PARTITION_CONFIG date, or UNDATED while it is unknown) and their unique
+index is (key..., partition_date). The upsert looks the date up by logical key and moves a
+row to its new partition when its date is corrected, so there is still one row per key.
+"""
+import logging
+from datetime import datetime
+
+from config import ENDPOINTS_MAP, MAPPING_CONFIG, PK_MAP, COLUMN_TYPES, SECONDARY_INDEXES, PARTITION_CONFIG, PARTITION_START_YEAR
+
+# Column types as they exist in each database, by (engine URL, table); see live_column_types.
+# Tables created before COLUMN_TYPES existed may still hold TEXT where the config now says DATE,
+# and the primary and an extra target can differ.
+LIVE_COLUMN_TYPES = {}
+
+# Derived column that partitioned tables are range-partitioned on
+PARTITION_KEY = "partition_date"
+# partition_date of rows whose date is unknown (lands in the default partition)
+UNDATED = "1900-01-01"
+
+
+def table_columns(table_name):
+    """DB columns of a table, in MAPPING_CONFIG order, followed by derived columns from COLUMN_TYPES."""
+    cols = []
+    for v in MAPPING_CONFIG[table_name].values():
+        cols.extend(v) if isinstance(v, list) else cols.append(v)
+    cols.extend(COLUMN_TYPES.get(table_name, {}))
+    return list(dict.fromkeys(cols))
+
+
+def conflict_key(table_name):
+    return [ p.strip() for p in PK_MAP.get(table_name, "corporate_number").split(",") ]
+
+
+def index_key(table_name, partitioned):
+    """Columns of the unique index that the upsert's ON CONFLICT targets."""
+    return conflict_key(table_name) + ([ PARTITION_KEY ] if partitioned else [])
+
+
+def live_column_types(engine, table_name):
+    """{ column: upper-case data type } of the table in that engine's database, read once and cached."""
+    key = (engine.url, table_name)
+    if key not in LIVE_COLUMN_TYPES:
+        with engine.connect() as conn:
+            LIVE_COLUMN_TYPES[key] = _existing_columns(conn, table_name)
+    return LIVE_COLUMN_TYPES[key]
+
+
+def is_partitioned(engine, table_name):
+    """True if the table has a partition_date in that engine's database."""
+    return PARTITION_KEY in live_column_types(engine, table_name)
+
+
+def partition_date_expr(table_name, *aliases):
+    """partition_date of a row: the first non-null date column among 'aliases', else UNDATED."""
+    col = PARTITION_CONFIG[table_name]
+    dates = "".join(f'{ a }."{ col }", ' for a in aliases)
+    return f"COALESCE({ dates }DATE '{ UNDATED }')"
+
+
+def column_type(table_name, col):
+    return COLUMN_TYPES.get(table_name, {}).get(col, "TEXT")
+
+
+def cast_expr(table_name, col, engine=None):
+    """
+    SELECT expression that converts a staged (text) value to the column's declared type.
+    With an 'engine', values are left alone if the column in that database doesn't have that type yet.
+    """
+    col_type = column_type(table_name, col)
+    live_type = live_column_types(engine, table_name).get(col) if engine is not None else None
+    if col_type == "TEXT" or (live_type and live_type != col_type):
+        return f'"{ col }"'
+    return f'CAST(NULLIF("{ col }"::text, \'\') AS { col_type }) AS "{ col }"'
+
+
+def conflict_index_name(table_name):
+    return f"{ table_name }_conflict_key"
+
+
+def _create_table_sql(table_name):
+    cols = [ f'    "{ c }" { column_type(table_name, c) }' for c in table_columns(table_name) ]
+    suffix = ""
+    if table_name in PARTITION_CONFIG:
+        cols.append(f'    "{ PARTITION_KEY }" DATE NOT NULL')
+        suffix = f' PARTITION BY RANGE ("{ PARTITION_KEY }")'
+    cols_str = ",\n".join(cols)
+    return f"CREATE TABLE { table_name } (\n{ cols_str }\n){ suffix }"
+
+
+def _create_conflict_index_sql(table_name, partitioned):
+    cols = ", ".join(f'"{ c }"' for c in index_key(table_name, partitioned))
+    return f"CREATE UNIQUE INDEX IF NOT EXISTS { conflict_index_name(table_name) } ON { table_name } ({ cols })"
+
+
+def _relkind(conn, table_name):
+    from sqlalchemy import text
+
+    return conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), { "t": table_name }
+    ).scalar()
+
+
+def _existing_columns(conn, table_name):
+    """{ column: upper-case data type } of an existing table."""
+    from sqlalchemy import text
+
+    rows = conn.execute(text("""
+        SELECT column_name, upper(data_type) FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = :t
+    """), { "t": table_name })
+    return { r[0]: r[1] for r in rows }
+
+
+def _unique_indexes(conn, table_name):
+    """{ index name: set of columns } of the plain (non-partial, non-expression) unique indexes of a table."""
+    from sqlalchemy import text
+
+    rows = conn.execute(text("""
+        SELECT i.indexrelid::regclass::text, array_agg(a.attname::text)
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = to_regclass(:t) AND i.indisunique
+          AND i.indpred IS NULL AND i.indexprs IS NULL
+        GROUP BY i.indexrelid
+    """), { "t": table_name })
+    return { r[0]: set(r[1]) for r in rows }
+
+
+def _drop_unique_index(conn, table_name, index_name):
+    """Drops a unique index, or the primary key / unique constraint it backs. Returns what was dropped."""
+    from sqlalchemy import text
+
+    constraint = conn.execute(text("""
+        SELECT conname, contype FROM pg_constraint WHERE conrelid = to_regclass(:t) AND conindid = to_regclass(:i)
+    """), { "t": table_name, "i": index_name }).first()
+    if constraint is None:
+        conn.execute(text(f"DROP INDEX { index_name }"))
+        return f"unique index { index_name }"
+    conn.execute(text(f'ALTER TABLE { table_name } DROP CONSTRAINT "{ constraint[0] }"'))
+    return f"{ 'primary key' if constraint[1] == 'p' else 'unique constraint' } { constraint[0] }"
+
+
+def _existing_indexes(conn, table_name):
+    from sqlalchemy import text
+
+    rows = conn.execute(text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :t"),
+                        { "t": table_name })
+    return { r[0] for r in rows }
+
+
+def _partitions(conn, table_name):
+    from sqlalchemy import text
+
+    return {
+        r[0] for r in conn.execute(
+            text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:t)"),
+            { "t": table_name }
+        )
+    }
+
+
+def ensure_partitions(conn, table_name, through_year=None):
+    """Creates any missing yearly partitions (PARTITION_START_YEAR..through_year) plus a default one."""
+    from sqlalchemy import text
+
+    through_year = through_year or datetime.now().year + 1
+    existing = _partitions(conn, table_name)
+    actions = []
+
+    for year in range(PARTITION_START_YEAR, through_year + 1):
+        name = f"{ table_name }_y{ year }"
+        if name in existing: continue
+        conn.execute(text(
+            f"CREATE TABLE { name } PARTITION OF { table_name } FOR VALUES FROM ('{ year }-01-01') TO ('{ year + 1 }-01-01')"
+        ))
+        actions.append(f"created partition { name }")
+
+    if f"{ table_name }_default" not in existing:
+        conn.execute(text(f"CREATE TABLE { table_name }_default PARTITION OF { table_name } DEFAULT"))
+        actions.append(f"created partition { table_name }_default")
+
+    return actions
+
+
+def _repartition(conn, table_name, kind):
+    """
+    Moves a plain table (or one partitioned on its raw date) aside and copies its rows into a
+    freshly created table partitioned on partition_date. Rows repeating a logical key keep the
+    one with the latest date.
+    """
+    from sqlalchemy import text
+
+    old_name = f"{ table_name }_unpartitioned" if kind == "r" else f"{ table_name }_old"
+    for partition in _partitions(conn, table_name):
+        conn.execute(text(f"ALTER TABLE { partition } RENAME TO { old_name }{ partition[len(table_name):] }"))
+    conn.execute(text(f"ALTER TABLE { table_name } RENAME TO { old_name }"))
+    conn.execute(text(f"ALTER INDEX IF EXISTS { conflict_index_name(table_name) } RENAME TO { old_name }_conflict_key"))
+
+    conn.execute(text(_create_table_sql(table_name)))
+    ensure_partitions(conn, table_name)
+    conn.execute(text(_create_conflict_index_sql(table_name, partitioned=True)))
+
+    old_cols = _existing_columns(conn, old_name)
+    cols = [ c for c in table_columns(table_name) if c in old_cols ]
+    cols_str = ", ".join(f'"{ c }"' for c in cols)
+    select_str = ", ".join(cast_expr(table_name, c) for c in cols)
+    keys = conflict_key(table_name)
+    key_str = ", ".join(f'"{ c }"' for c in keys)
+    # Rows with an incomplete key never conflict, so all of them are kept
+    incomplete = " OR ".join(f'"{ c }" IS NULL' for c in keys)
+    result = conn.execute(text(f"""
+        INSERT INTO { table_name } ({ cols_str }, "{ PARTITION_KEY }")
+        SELECT { cols_str }, { partition_date_expr(table_name, "ranked") }
+        FROM (
+            SELECT *, row_number() OVER (PARTITION BY { key_str } ORDER BY "{ PARTITION_CONFIG[table_name] }" DESC NULLS LAST) AS rn
+            FROM (SELECT { select_str } FROM { old_name }) cast_rows
+        ) ranked
+        WHERE rn = 1 OR { incomplete }
+        ON CONFLICT DO NOTHING
+    """))
+    return f"repartitioned { table_name } ({ result.rowcount } rows copied, old table kept as { old_name })"
+
+
+def ensure_table(engine, table_name, repartition=False):
+    """Brings one table up to date with the config. Returns a list of actions taken."""
+    from sqlalchemy import text
+
+    actions = []
+    with engine.begin() as conn:
+        kind = _relkind(conn, table_name)
+
+        if kind is None:
+            conn.execute(text(_create_table_sql(table_name)))
+            actions.append(f"created { table_name }")
+            kind = "p" if table_name in PARTITION_CONFIG else "r"
+        elif table_name in PARTITION_CONFIG and (kind != "p" or PARTITION_KEY not in _existing_columns(conn, table_name)):
+            # Plain, or partitioned on the raw (nullable) date by an earlier version
+            if repartition:
+                actions.append(_repartition(conn, table_name, kind))
+                kind = "p"
+            elif kind == "p":
+                logging.error(f"{ table_name } is partitioned on { PARTITION_CONFIG[table_name] }; "
+                              f"run 'migrate --repartition' before syncing it.")
+                LIVE_COLUMN_TYPES[(engine.url, table_name)] = _existing_columns(conn, table_name)
+                return actions
+            else:
+                logging.warning(f"{ table_name } is not partitioned; run 'migrate --repartition' to convert it.")
+
+        existing = _existing_columns(conn, table_name)
+        for col in table_columns(table_name):
+            if col not in existing:
+                conn.execute(text(f'ALTER TABLE { table_name } ADD COLUMN "{ col }" { column_type(table_name, col) }'))
+                actions.append(f"added { table_name }.{ col }")
+
+        if kind == "p":
+            actions.extend(ensure_partitions(conn, table_name))
+
+        key = index_key(table_name, partitioned=kind == "p")
+        unique = _unique_indexes(conn, table_name)
+        for name, cols in list(unique.items()):
+            # Our own index built for an older key, e.g. (corporate_number, application_number, application_date)
+            # from before partition_date, or any unique index / primary key that leaves out part of the key,
+            # e.g. corporate_number alone from when finance was keyed on it: it rejects every second
+            # fiscal period of a corporation that the declared key keeps as its own row.
+            stale = name == conflict_index_name(table_name) and cols != set(key)
+            if stale or not set(conflict_key(table_name)) <= cols:
+                dropped = _drop_unique_index(conn, table_name, name)
+                actions.append(f"dropped { dropped } ({ ', '.join(sorted(cols)) }), which conflicts with the key ({ ', '.join(key) })")
+                del unique[name]
+        if set(key) not in unique.values():
+            conn.execute(text(_create_conflict_index_sql(table_name, partitioned=kind == "p")))
+            actions.append(f"created unique index on { table_name } ({ ', '.join(key) })")
+
+        indexes = _existing_indexes(conn, table_name)
+        for col in SECONDARY_INDEXES.get(table_name, []):
+            name = f"{ table_name }_{ col }_idx"[:63]
+            if name not in indexes:
+                conn.execute(text(f'CREATE INDEX { name } ON { table_name } ("{ col }")'))
+                actions.append(f"created index { name }")
+
+        LIVE_COLUMN_TYPES[(engine.url, table_name)] = _existing_columns(conn, table_name)
+
+    return actions
+
+
+def ensure_schema(engine, tables=None, repartition=False):
+    """Creates/migrates every ENDPOINTS_MAP table (or just 'tables'). Returns the actions taken."""
+    actions = []
+    for table_name in tables or ENDPOINTS_MAP.values():
+        try:
+            actions.extend(ensure_table(engine, table_name, repartition))
+        except Exception as e:
+            # e.g. existing duplicates that block the unique index; the table's upserts will report it
+            logging.error(f"Could not migrate { table_name }: { str(e).splitlines()[0] }")
+    for action in actions:
+        logging.info(f"Schema: { action }")
+    return actions
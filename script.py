@@ -1,11 +1,28 @@
-import pandas as pd
-import requests
 import os
+import sys
+import json
+import glob
 import logging
 import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
+from config import ENDPOINTS_MAP, TABLE_CONFIG, MAPPING_CONFIG, YEN_METRICS, UNIT_MULTIPLIERS, UPDATED_AT_COLUMN, MAX_BATCH_ROWS, PARTITION_CONFIG
+from profiling import make_profiler, NullProfiler
+from dlq import DeadLetterQueue, ensure_dlq_table
+import changelog
+import corporate_profile
+import schema
+import history
+import reconcile
+import scheduler
+import quality
+from identity import IdentityCache, IDENTITY_FIELDS
+import sinks
+
+# pandas, requests and SQLAlchemy are imported inside the functions that need them,
+# so cheap commands like 'status' or '--help' don't pay for loading them.
 
 # Load local .env for your manual tests
 load_dotenv()
@@ -13,224 +30,13 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 DB_URL = os.getenv('DB_URL', '')
+# Extra databases that receive every batch written to DB_URL (whitespace-separated, see sinks.py)
+SINK_URLS = os.getenv('SINK_URLS', '').split()
 GBIZ_TOKEN = os.getenv('GBIZ_API_KEY', 'hUSgZr1FiAcDqvZA9UN9ZUFSXhkkNBMU')
 BASE_URL = "https://info.gbiz.go.jp/hojin/v1/hojin/updateInfo"
 
-# Mapping endpoints to table names
-ENDPOINTS_MAP = {
-    "": "corporate_basic_information_gbizinfo",
-    "/certification": "notification_certification_information_gbizinfo",
-    "/commendation": "award_information_gbizinfo",
-    "/finance": "financial_information_gbizinfo",
-    "/patent": "patent_information_gbizinfo",
-    "/procurement": "procurement_information_gbizinfo",
-    "/subsidy": "subsidy_information_gbizinfo",
-    "/workplace": "workplace_information_gbizinfo"
-}
-
-TABLE_CONFIG = {
-    "corporate_basic_information_gbizinfo": {
-        "record_path": None,
-        "meta": []
-    },
-    "notification_certification_information_gbizinfo": {
-        "record_path": [ "certification" ],
-        "meta": [ "corporate_number", "name", "location" ]
-    },
-    "award_information_gbizinfo": {
-        "record_path": [ "commendation" ],
-        "meta": [ "corporate_number", "name", "location" ]
-    },
-    "financial_information_gbizinfo": {
-        "record_path": [ "finance", "management_index" ],
-        "meta": [
-            "corporate_number", "name", "location",
-            ["finance", "accounting_standards"],
-            ["finance", "fiscal_year_cover_page"],
-            ["finance", "sh1_n"], ["finance", "sh1_r"],
-            ["finance", "sh2_n"], ["finance", "sh2_r"],
-            ["finance", "sh3_n"], ["finance", "sh3_r"],
-            ["finance", "sh4_n"], ["finance", "sh4_r"],
-            ["finance", "sh5_n"], ["finance", "sh5_r"]
-        ]
-    },
-    "patent_information_gbizinfo": {
-        "record_path": [ "patent" ],
-        "meta": [ "corporate_number", "name", "location" ]
-    },
-    "procurement_information_gbizinfo": {
-        "record_path": [ "procurement" ],
-        "meta": [ "corporate_number", "name", "location" ]
-    },
-    "subsidy_information_gbizinfo": {
-        "record_path": [ "subsidy" ],
-        "meta": [ "corporate_number", "name", "location" ]
-    },
-    "workplace_information_gbizinfo": {
-        "record_path": None,
-        "meta": [ "corporate_number", "name", "location" ]
-    }
-}
-
-# --- COLUMN MAPPING CONFIGURATION ---
-# Format: 'API_JSON_KEY': 'DB_COLUMN_NAME'
-MAPPING_CONFIG = {
-    "corporate_basic_information_gbizinfo": {
-        "corporate_number": "corporate_number",
-        "name": "corporate_name",
-        "kana": "corporate_furigana",
-        "name_en": "corporate_en_name",
-        "postal_code": "postal_code",
-        "location": "headquarters_address",
-        "status": "status",
-        "close_date": "close_date",
-        "close_cause": "close_cause",
-        "representative_name": "corporate_representative_name",
-        "representative_position": "corporate_representative_position",
-        "capital_stock": "capital",
-        "employee_number": "employees",
-        "company_size_male": "employees_male",
-        "company_size_female": "employees_female",
-        "business_items": "product_lineup_list",
-        "business_summary": "business_overview",
-        "company_url": "company_website",
-        "date_of_establishment": "date_of_establishment",
-        "founding_year": "year_of_founding",
-        "update_date": "last_updated_date",
-        "qualification_grade": "qualification_level"
-    },
-    "notification_certification_information_gbizinfo": {
-        "corporate_number": "corporate_number",
-        ######### TO REMOVE #########
-        "name": ["name_corporate_number", "name"],
-        "location": ["headquarters_address_corporate_number", "headquarters_address"],
-        ######### TO REMOVE #########
-        "date_of_approval": "certification_date",
-        "title": "notification_certification",
-        "target": "target",
-        "category": "department",
-        # company_size,
-        "expiration_date": "expiration_date",
-        "government_departments": "ministry_agency"
-    },
-    "award_information_gbizinfo": {
-        "corporate_number": "corporate_number",
-        ######### TO REMOVE #########
-        "name": ["corporate_name", "award_corporate_name"],
-        "location": ["headquarters_address", "award_headquarters_address"],
-        ######### TO REMOVE #########
-        "date_of_commendation": "certification_date",
-        "title": "award_name",
-        "target": "award_target",
-        "category": "department",
-        "government_departments": "ministry_agency"
-    },
-    "financial_information_gbizinfo": {
-        "corporate_number": "corporate_number",
-        ######### TO REMOVE #########
-        "name": ["corporate_name", "financial_corporate_name"],
-        "location": ["headquarters_address", "financial_headquarters_address"],
-        ######### TO REMOVE #########
-        "finance.accounting_standards": "accounting_standard",
-        "finance.fiscal_year_cover_page": "fiscal_year",
-
-        "period": "fiscal_period",
-        "net_sales_summary_of_business_results": "net_sales",
-        "net_sales_summary_of_business_results_unit_ref": "net_sales_unit",
-        "operating_revenue1_summary_of_business_results": "operating_revenue",
-        "operating_revenue1_summary_of_business_results_unit_ref": "operating_revenue_unit",
-        "operating_revenue2_summary_of_business_results": "operating_income",
-        "operating_revenue2_summary_of_business_results_unit_ref": "operating_income_unit",
-        "gross_operating_revenue_summary_of_business_results": "total_operating_revenue",
-        "gross_operating_revenue_summary_of_business_results_unit_ref": "total_operating_revenue_unit",
-        "ordinary_income_summary_of_business_results": "ordinary_revenue",
-        "ordinary_income_summary_of_business_results_unit_ref": "ordinary_revenue_unit",
-        "net_premiums_written_summary_of_business_results_ins": "net_premiums_written",
-        "net_premiums_written_summary_of_business_results_ins_unit_ref": "net_premiums_written_unit",
-        "ordinary_income_loss_summary_of_business_results": "ordinary_profit_or_loss",
-        "ordinary_income_loss_summary_of_business_results_unit_ref": "ordinary_profit_or_loss_unit",
-        "net_income_loss_summary_of_business_results": "net_income_or_loss",
-        "net_income_loss_summary_of_business_results_unit_ref": "net_income_or_loss_unit",
-        "capital_stock_summary_of_business_results": "capital_stock",
-        "capital_stock_summary_of_business_results_unit_ref": "capital_stock_unit",
-        "net_assets_summary_of_business_results": "net_assets",
-        "net_assets_summary_of_business_results_unit_ref": "net_assets_unit",
-        "total_assets_summary_of_business_results": "total_assets",
-        "total_assets_summary_of_business_results_unit_ref": "total_assets_unit",
-        "number_of_employees": "number_of_employees",
-        "number_of_employees_unit_ref": "number_of_employees_unit",
-        "finance.sh1_n": "major_shareholder1", "finance.sh1_r": "major_shareholder1_ratio",
-        "finance.sh2_n": "major_shareholder2", "finance.sh2_r": "major_shareholder2_ratio",
-        "finance.sh3_n": "major_shareholder3", "finance.sh3_r": "major_shareholder3_ratio",
-        "finance.sh4_n": "major_shareholder4", "finance.sh4_r": "major_shareholder4_ratio",
-        "finance.sh5_n": "major_shareholder5", "finance.sh5_r": "major_shareholder5_ratio"
-    },
-    "patent_information_gbizinfo": {
-        "corporate_number": "corporate_number",
-        "name": ["corporate_name", "patent_corporate_name"],
-        "location": ["headquarters_address", "patent_headquarters_address"],
-        "patent_type": "patent_design_trademark",
-        "application_number": "application_number",
-        "application_date": "application_date",
-
-        "fi_code": "patent_fi_code",
-        "fi_jp": "patent_fi_code_jp",
-        "fterm_code": "patent_f_term_theme_code",
-
-        "design_code": "design_new_classification_code",
-        "design_jp": "design_new_classification_code_jp",
-
-        "trademark_code": "trademark_class_code",
-        "trademark_jp": "trademark_class_code_jp",
-        "title": "invention_name_or_design_or_trademark"
-    },
-    "procurement_information_gbizinfo": {
-        "corporate_number": "corporate_number",
-        "name": ["corporate_name", "procurement_name"],
-        "location": ["headquarters_address", "procurement_headquarters_address"],
-        "date_of_order": "order_date",
-        "title": "project_name",
-        "amount": "amount",
-        "government_departments": "ministry_agency",
-        "joint_signatures": "joint_name_list"
-    },
-    "subsidy_information_gbizinfo": {
-        "corporate_number": "corporate_number",
-        "name": ["corporate_name", "subsidy_corporate_name"],
-        "location": ["headquarters_address", "subsidy_headquarters_address"],
-        "date_of_approval": "certification_date",
-        "title": "subsidy",
-        "amount": "amount",
-        "target": "target",
-        "government_departments": "ministry_agency",
-        "note": "remarks",
-        "joint_signatures": "joint_name_list",
-        "subsidy_resource": "subsidy_source"
-    },
-    "workplace_information_gbizinfo": {
-        "corporate_number": "corporate_number",
-        "name": ["corporate_name", "workplace_corporate_name"],
-        "location": ["headquarters_address", "workplace_headquarters_address"],
-        "workplace_info.base_infos.average_continuous_service_years_type": "average_years_of_service_range",
-        "workplace_info.base_infos.average_continuous_service_years_Male": "average_years_of_service_male",
-        "workplace_info.base_infos.average_continuous_service_years_Female": "average_years_of_service_female",
-        "workplace_info.base_infos.average_continuous_service_years": "average_years_of_service_for_permanent_employees",
-        "workplace_info.base_infos.average_age": "average_age_of_employees",
-        "workplace_info.base_infos.month_average_predetermined_overtime_hours": "average_monthly_overtime_hours",
-
-        "workplace_info.women_activity_infos.female_workers_proportion_type": "ratio_of_female_employees_range",
-        "workplace_info.women_activity_infos.female_workers_proportion": "ratio_of_female_employees",
-        "workplace_info.women_activity_infos.female_share_of_manager": "number_of_female_managers",
-        "workplace_info.women_activity_infos.gender_total_of_manager": "total_number_of_managers_male_and_female",
-        "workplace_info.women_activity_infos.female_share_of_officers": "number_of_female_executives",
-        "workplace_info.women_activity_infos.gender_total_of_officers": "total_number_of_executives_male_and_female",
-
-        "workplace_info.compatibility_of_childcare_and_work.number_of_paternity_leave": "eligible_for_childcare_leave_male",
-        "workplace_info.compatibility_of_childcare_and_work.number_of_maternity_leave": "eligible_for_childcare_leave_female",
-        "workplace_info.compatibility_of_childcare_and_work.paternity_leave_acquisition_num": "taking_childcare_leave_male",
-        "workplace_info.compatibility_of_childcare_and_work.maternity_leave_acquisition_num": "taking_childcare_leave_female"
-    }
-}
+DEFAULT_FROM_DATE = "20250901"
+DEFAULT_CACHE_DIR = "page_cache"
 
 def preprocess_gbiz_data(hojin_infos):
     """Handles all data cleaning (financials, patents, lists) in one pass."""
@@ -271,171 +77,1187 @@ def preprocess_gbiz_data(hojin_infos):
             if isinstance(items, list):
                 for item in items:
                     joint = item.get("joint_signatures")
-                    item["joint_signatures"] = ", ".join(joint) if isinstance(joint, list) else None
+                    # Strings are kept so records can be preprocessed again when retried
+                    item["joint_signatures"] = ", ".join(joint) if isinstance(joint, list) else joint if isinstance(joint, str) else None
 
     return hojin_infos
 
-def parse_gbiz_table(table_name, raw_json):
-    """Main function to transform gBizInfo JSON into a clean DataFrame."""
+def normalize_yen_units(df, metrics):
+    """
+    Adds '<metric>_yen' = value * UNIT_MULTIPLIERS[<metric>_unit] for every metric, as a single
+    array multiplication over the page. Non-numeric values or unknown units give NaN (NULL).
+    """
+    import numpy as np
+    import pandas as pd
+
+    metrics = [ m for m in metrics if m in df.columns ]
+    if not metrics:
+        return df
+
+    values = df[metrics].apply(
+        lambda s: pd.to_numeric(s.astype("string").str.replace(",", "", regex=False).str.strip(), errors="coerce")
+    )
+    units = df.reindex(columns=[ f"{ m }_unit" for m in metrics ])
+    factors = units.apply(lambda s: s.astype("string").str.strip().map(UNIT_MULTIPLIERS))
+
+    yen = values.to_numpy(dtype=np.float64) * factors.to_numpy(dtype=np.float64)
+    return df.assign(**{ f"{ m }_yen": yen[:, i] for i, m in enumerate(metrics) })
+
+def dedupe_keys(table_name, df):
+    """
+    Collapses rows that share a conflict key, since ON CONFLICT DO UPDATE can't touch the same row
+    twice in one statement. Keeps the latest UPDATED_AT_COLUMN, then the last row by position.
+    Keys are compared as they are staged, so ' a ' and 'a' stay two rows. Rows with a NULL key
+    column never conflict and are all kept. Returns (df, rows collapsed).
+    """
+    import numpy as np
+    import pandas as pd
+
+    keys = schema.conflict_key(table_name)
+    if df.empty or not set(keys) <= set(df.columns):
+        return df, 0
+
+    key_df = df[keys].astype("string").reset_index(drop=True)
+    empty = key_df.isna()
+    # Typed key columns stage '' as NULL (schema.cast_expr)
+    typed = [ c for c in keys if schema.column_type(table_name, c) != "TEXT" ]
+    if typed:
+        empty[typed] = empty[typed] | key_df[typed].eq("")
+    has_key = ~empty.any(axis=1).to_numpy()
+    ranked = key_df[has_key]
+    if not ranked.duplicated(keep=False).any():
+        return df, 0
+
+    ranked = ranked.assign(_pos=np.flatnonzero(has_key))
+    if UPDATED_AT_COLUMN in df.columns:
+        updated = pd.to_datetime(df[UPDATED_AT_COLUMN].astype("string").to_numpy()[has_key], errors="coerce", utc=True)
+        ranked = ranked.assign(_updated=updated).sort_values([ "_updated", "_pos" ], na_position="first")
+
+    keep = ~has_key
+    keep[ranked.drop_duplicates(subset=keys, keep="last")["_pos"].to_numpy()] = True
+    return df[keep], int((~keep).sum())
+
+def _child_list(record, record_path):
+    node = record
+    for key in record_path:
+        node = node.get(key) if isinstance(node, dict) else None
+    return node if isinstance(node, list) else []
+
+def _with_child_list(record, record_path, items):
+    """Shallow copy of a hojin-info whose list at 'record_path' is replaced by 'items'."""
+    head = dict(record)
+    node = head
+    for key in record_path[:-1]:
+        node[key] = dict(node.get(key) or {})
+        node = node[key]
+    node[record_path[-1]] = items
+    return head
+
+def iter_record_batches(table_name, hojin_infos, max_rows):
+    """
+    Yields lists of hojin-infos that flatten to at most 'max_rows' rows each.
+    A corporation with a longer child list (patents, procurement, ...) is split across batches.
+    """
+    if max_rows < 1:
+        raise ValueError(f"Batches must hold at least 1 row, got { max_rows }")
+
+    record_path = TABLE_CONFIG[table_name].get("record_path")
+    batch, size = [], 0
+
+    for record in hojin_infos:
+        if not record_path:
+            batch.append(record)
+            size += 1
+            if size >= max_rows:
+                yield batch
+                batch, size = [], 0
+            continue
+
+        items = _child_list(record, record_path)
+        start = 0
+        while start < len(items):
+            take = min(max_rows - size, len(items) - start)
+            batch.append(_with_child_list(record, record_path, items[start:start + take]))
+            size += take
+            start += take
+            if size >= max_rows:
+                yield batch
+                batch, size = [], 0
+
+    if batch:
+        yield batch
+
+def parse_gbiz_table(table_name, raw_json, profiler=None):
+    """Main function to transform gBizInfo JSON into a clean DataFrame (the whole page at once)."""
+    import pandas as pd
+
+    frames = list(iter_gbiz_frames(table_name, raw_json, profiler=profiler))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def iter_gbiz_frames(table_name, raw_json, max_rows=MAX_BATCH_ROWS, profiler=None, identity=None):
+    """
+    Like parse_gbiz_table, but yields the page as DataFrames of at most 'max_rows' rows.
+    With an 'identity' cache, child tables leave name/location out of parsing (see identity.py).
+    """
+    profiler = profiler or NullProfiler()
     data = raw_json.get("hojin-infos", [])
-    if not data: return pd.DataFrame()
+    if not data: return
 
-    processed_data = preprocess_gbiz_data(data)
+    with profiler.stage(table_name, "preprocess"):
+        processed_data = preprocess_gbiz_data(data)
+        if identity is not None:
+            identity.remember(processed_data)
+
+    skip_identity = identity is not None and bool(TABLE_CONFIG[table_name].get("record_path"))
+    for batch in iter_record_batches(table_name, processed_data, max_rows):
+        yield records_to_frame(table_name, batch, profiler, skip_identity)
+
+def records_to_frame(table_name, processed_data, profiler=None, skip_identity=False):
+    """
+    Flattens preprocessed hojin-infos into the table's columns.
+    'skip_identity' drops name/location from a child table's meta; IdentityCache.attach adds them later.
+    """
+    import pandas as pd
+
+    profiler = profiler or NullProfiler()
     t_cfg = TABLE_CONFIG.get(table_name)
     m_cfg = MAPPING_CONFIG.get(table_name)
 
-    # Flatten logic
-    if t_cfg.get("record_path"):
-        df = pd.json_normalize(processed_data, record_path=t_cfg["record_path"], meta=t_cfg["meta"], errors='ignore')
+    with profiler.stage(table_name, "normalize"):
+        # Flatten logic
+        if t_cfg.get("record_path"):
+            meta = [ m for m in t_cfg["meta"] if m not in IDENTITY_FIELDS ] if skip_identity else t_cfg["meta"]
+            df = pd.json_normalize(processed_data, record_path=t_cfg["record_path"], meta=meta, errors='ignore')
+        else:
+            df = pd.json_normalize(processed_data)
+
+        # Column Mapping (Handles multi-columns and renaming)
+        for src_key, target in m_cfg.items():
+            if src_key in df.columns:
+                if isinstance(target, list):
+                    for col in target: df[col] = df[src_key]
+                else:
+                    df = df.rename(columns={src_key: target})
+
+        # Final filtering to target columns only
+        valid_cols = []
+        for v in m_cfg.values():
+            valid_cols.extend(v) if isinstance(v, list) else valid_cols.append(v)
+
+        df = df[df.columns.intersection(valid_cols)]
+
+    if table_name in YEN_METRICS:
+        with profiler.stage(table_name, "units"):
+            df = normalize_yen_units(df, YEN_METRICS[table_name])
+
+    return df
+
+
+def fetch_page(endpoint_suffix, table_name, from_date, to_date, page, stats=None):
+    """Fetches a single API page, raising on any non-200 response."""
+    import requests
+
+    headers = {'accept': 'application/json', 'X-hojinInfo-api-token': GBIZ_TOKEN}
+    params = { 'page': page, 'from': from_date, 'to': to_date }
+    response = requests.get(f"{ BASE_URL }{ endpoint_suffix }", headers=headers, params=params)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"Error { response.status_code } on { table_name } page { page }")
+
+    if stats is not None:
+        stats["bytes"] += len(response.content)
+    return response.json()
+
+def fetch_pages(endpoint_suffix, table_name, from_date, to_date, max_pages=None, cache_dir=None, dlq=None,
+                stats=None, start_page=1):
+    """
+    Yields (page, raw_json) from the gBizInfo API, optionally saving every page for 'replay'.
+    With a 'dlq', a page that fails after the first one is dead-lettered and skipped. If the
+    first page fails, the rest of the window is dead-lettered as one 'window' entry and the
+    error is raised. Without a 'dlq', any failed page raises.
+    """
+    page = start_page
+    total_pages = None
+
+    while True:
+        try:
+            raw_json = fetch_page(endpoint_suffix, table_name, from_date, to_date, page, stats)
+        except Exception as e:
+            logging.error(str(e))
+            # Without a first page we don't know how many pages there are
+            if total_pages is None:
+                if dlq is not None:
+                    dlq.add("window", table_name, endpoint_suffix, from_date, to_date, page, e)
+                raise
+            if dlq is None:
+                raise
+            dlq.add("page", table_name, endpoint_suffix, from_date, to_date, page, e)
+            raw_json = None
+
+        if raw_json is not None:
+            total_pages = raw_json.get("total_pages", 1)
+            if cache_dir:
+                cache_page(cache_dir, table_name, from_date, to_date, page, raw_json)
+
+            yield page, raw_json
+
+        # Check for next page
+        if page >= total_pages: return
+        if max_pages and page - start_page + 1 >= max_pages:
+            logging.info(f"Page limit ({ max_pages }) reached for { table_name }.")
+            return
+        page += 1
+
+def cache_page(cache_dir, table_name, from_date, to_date, page, raw_json):
+    """Stores a raw API page as <cache_dir>/<table>/<from>_<to>/page_00001.json."""
+    path = os.path.join(cache_dir, table_name, f"{ from_date }_{ to_date }")
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, f"page_{ page:05d}.json"), "w", encoding="utf-8") as f:
+        json.dump(raw_json, f, ensure_ascii=False)
+
+def iter_cached_pages(cache_dir, table_name, from_date=None, to_date=None, max_pages=None, stats=None, start_page=1):
+    """Yields (page, raw_json) from pages saved by cache_page, in window then page order."""
+    window = f"{ from_date }_{ to_date }" if from_date and to_date else "*"
+    files = sorted(glob.glob(os.path.join(cache_dir, table_name, window, "page_*.json")))
+
+    for i, file in enumerate(files[start_page - 1:], start=start_page):
+        if max_pages and i - start_page + 1 > max_pages: return
+        if stats is not None:
+            stats["bytes"] += os.path.getsize(file)
+        with open(file, encoding="utf-8") as f:
+            yield i, json.load(f)
+
+def iter_cached_frames(cache_dir, table_name, prefixes=None, batch_rows=MAX_BATCH_ROWS):
+    """
+    Parses every cached page of a table (all windows, oldest first) in the same batches as a sync,
+    collapsing repeated conflict keys within each batch. 'prefixes' limits it to those corporate_number prefixes.
+    """
+    for _, raw_json in iter_cached_pages(cache_dir, table_name):
+        for df in iter_gbiz_frames(table_name, raw_json, batch_rows):
+            if df.empty or "corporate_number" not in df.columns: continue
+            if prefixes is not None:
+                df = df[df["corporate_number"].astype("string").str[:reconcile.SAMPLE_DEPTH].isin(prefixes)]
+            df, _ = dedupe_keys(table_name, df)
+            yield df
+
+def upsert_dataframe(engine, table_name, df, run_id=None):
+    """Merges a parsed page into its table, logs touched keys to the changelog and returns (inserts, updates)."""
+    from sqlalchemy import text
+
+    inserts = 0
+    updates = 0
+    # One staging table per target so tables can be synced in parallel
+    temp_table = f"temp_{ table_name }"
+
+    pk_list = schema.conflict_key(table_name)
+    partitioned = schema.is_partitioned(engine, table_name)
+    # Key columns (and the partition date) the page didn't provide are staged as NULL so the key lookups below stay valid
+    needed = [ *pk_list, *([ PARTITION_CONFIG[table_name] ] if partitioned else []) ]
+    missing_keys = [ c for c in needed if c not in df.columns ]
+    if missing_keys:
+        df = df.assign(**{ c: None for c in missing_keys })
+
+    # 1. Temporary Upload for Upsert
+    df.to_sql(temp_table, engine, if_exists='replace', index=False)
+
+    select_str = ", ".join([schema.cast_expr(table_name, c, engine) for c in df.columns])
+    returning = ", ".join(f'"{ c }"' for c in dict.fromkeys([ "corporate_number", *pk_list ]))
+    key_match = lambda a, b: " AND ".join(f'{ a }."{ c }" = { b }."{ c }"' for c in pk_list)
+
+    if partitioned:
+        # Rows are matched on the logical key. 'old' is their current version: it fills values
+        # (and the date) the page left empty, and 'moved' deletes it when the row's partition_date
+        # changed, so the INSERT puts the row into its new partition instead of adding a second one.
+        live = schema.live_column_types(engine, table_name)
+        cols = [ c for c in schema.table_columns(table_name) if c in live ]
+        keyed_str = ", ".join(
+            f'COALESCE(CAST(s."{ c }" AS { live[c] }), o."{ c }") AS "{ c }"' if c in df.columns else f'o."{ c }"'
+            for c in cols
+        )
+        part = schema.PARTITION_KEY
+        source_ctes = f"""
+            existing AS (
+                SELECT t.* FROM { table_name } t JOIN src s ON { key_match("t", "s") }
+            ),
+            keyed AS (
+                SELECT { keyed_str }, { schema.partition_date_expr(table_name, "s", "o") } AS "{ part }"
+                FROM src s LEFT JOIN existing o ON { key_match("s", "o") }
+            ),
+            moved AS (
+                DELETE FROM { table_name } t USING keyed k
+                WHERE { key_match("t", "k") } AND t."{ part }" <> k."{ part }"
+            ),
+        """
+        cols = [ *cols, part ]
+        rows_from = "keyed"
     else:
-        df = pd.json_normalize(processed_data)
+        cols = list(df.columns)
+        source_ctes = f"""
+            existing AS (
+                SELECT { ", ".join(f't."{ c }"' for c in pk_list) }
+                FROM { table_name } t JOIN src s ON { key_match("t", "s") }
+            ),
+        """
+        rows_from = "src"
 
-    # Column Mapping (Handles multi-columns and renaming)
-    for src_key, target in m_cfg.items():
-        if src_key in df.columns:
-            if isinstance(target, list):
-                for col in target: df[col] = df[src_key]
+    pk = ", ".join(f'"{ c }"' for c in schema.index_key(table_name, partitioned))
+    update_cols = [
+        f'"{ c }" = COALESCE(EXCLUDED."{ c }", { table_name }."{ c }")'
+        for c in cols if c not in schema.index_key(table_name, partitioned)
+    ]
+
+    update_stmt = ", ".join(update_cols)
+    cols_str = ", ".join([f'"{ c }"' for c in cols])
+
+    # 2. SQL Upsert Logic
+    with engine.begin() as conn:
+        # 'existing' is read from the same snapshot as the INSERT, so it tells inserts from updates.
+        # (xmax = 0) can't be used because partitioned tables don't expose system columns.
+        query = f"""
+            WITH src AS (
+                SELECT { select_str } FROM { temp_table }
+            ),
+            { source_ctes }
+            merged AS (
+                INSERT INTO { table_name } ({ cols_str })
+                SELECT { cols_str } FROM { rows_from }
+                ON CONFLICT ({ pk })
+                DO UPDATE SET { update_stmt }
+                WHERE { table_name }.* IS DISTINCT FROM EXCLUDED.*
+                RETURNING { returning }
+            ),
+            upserted AS (
+                SELECT m.*, NOT EXISTS (SELECT 1 FROM existing e WHERE { key_match("e", "m") }) AS is_insert
+                FROM merged m
+            )
+            { changelog.append_changes_sql(pk_list) }
+        """
+        result = conn.execute(text(query), { "run_id": run_id, "table_name": table_name })
+        for row in result:
+            if row.is_insert:
+                inserts += 1
             else:
-                df = df.rename(columns={src_key: target})
+                updates += 1
+
+        conn.execute(text(f"DROP TABLE IF EXISTS { temp_table }"))
+
+    return inserts, updates
+
+def load_page(engine, table_name, raw_json, profiler=None, run_id=None, stats=None, batch_rows=MAX_BATCH_ROWS,
+              identity=None, fanout=None, reject=None, progress=None):
+    """
+    Parses one API page and upserts it in batches of at most 'batch_rows' rows, so a corporation
+    with thousands of child records never becomes one huge DataFrame. Returns (inserts, updates, rows).
+    Batches the primary accepted are also queued for every 'fanout' target.
+    Rows that fail the data-quality rules are passed to 'reject(rows, reasons)' once the rest
+    of their batch has loaded; without 'reject' they raise quality.DataQualityError.
+    A 'progress' dict is kept up to date with the batches finished so far and their inserts,
+    updates and rows, so a caller can tell what a page that failed part-way already loaded.
+    """
+    # Tables without a record_path (basic, workplace) only fill the cache; they parse name/location themselves
+    attach_identity = identity is not None and bool(TABLE_CONFIG[table_name].get("record_path"))
+    profiler = profiler or NullProfiler()
+    done = progress if progress is not None else {}
+    done.update(batches=0, inserted=0, updated=0, rows=0)
+
+    # --- THE REFACTORED INTEGRATION POINT ---
+    # Instead of manual flattening and renaming, we call our Master Parser.
+    # This one line replaces all the old 'if list_key' logic.
+    frames = iter_gbiz_frames(table_name, raw_json, batch_rows, profiler, identity)
+    # ----------------------------------------
+
+    while True:
+        with history.timed(stats, "parse"):
+            df = next(frames, None)
+        if df is None:
+            break
+        if not df.empty:
+            ins, upd, n = _load_batch(engine, table_name, df, profiler, run_id, stats, identity if attach_identity else None,
+                                      fanout, reject)
+            done["inserted"] += ins
+            done["updated"] += upd
+            done["rows"] += n
+        done["batches"] += 1
+        del df
+
+    return done["inserted"], done["updated"], done["rows"]
+
+def _load_batch(engine, table_name, df, profiler, run_id, stats, identity, fanout, reject):
+    """One parsed batch of load_page. Its statistics are only counted once it has loaded."""
+    if identity is not None:
+        with profiler.stage(table_name, "identity"), history.timed(stats, "identity"):
+            identity.load_missing(engine, df["corporate_number"])
+            df = identity.attach(table_name, df)
 
-    # Final filtering to target columns only
-    valid_cols = []
-    for v in m_cfg.values():
-        valid_cols.extend(v) if isinstance(v, list) else valid_cols.append(v)
+    batch_quality = quality.new_stats()
+    with profiler.stage(table_name, "validate"), history.timed(stats, "validate"):
+        df, rejected, reasons = quality.check(table_name, df, batch_quality)
+    if not rejected.empty and reject is None:
+        raise quality.DataQualityError(table_name, [ f"{ len(rejected) } row(s) rejected, e.g. { reasons.iloc[0] }" ])
 
-    return df[df.columns.intersection(valid_cols)]
+    ins = upd = collapsed = 0
+    if not df.empty:
+        with profiler.stage(table_name, "dedupe"), history.timed(stats, "dedupe"):
+            df, collapsed = dedupe_keys(table_name, df)
+        if collapsed:
+            logging.info(f"{ table_name }: collapsed { collapsed } row(s) with a repeated conflict key.")
 
-def sync_endpoint(engine, endpoint_suffix, table_name, from_date, to_date):
+        with profiler.stage(table_name, "upsert"), history.timed(stats, "upsert"):
+            ins, upd = upsert_dataframe(engine, table_name, df, run_id)
+        if fanout:
+            with history.timed(stats, "fanout"):
+                fanout.submit(table_name, df, run_id)
+
+    if not rejected.empty:
+        reject(rejected, reasons)
+    if stats is not None:
+        stats["collapsed"] += collapsed
+        quality.merge_stats(stats["quality"], batch_quality)
+    return ins, upd, len(df)
+
+def dead_letter_rows(dlq, table_name, endpoint_suffix, from_date, to_date, page):
+    """load_page 'reject' callback that sends each rejected row of a page to the dead-letter queue."""
+    def reject(rows, reasons):
+        logging.warning(f"Page { page } of { table_name }: { len(rows) } row(s) rejected ({ reasons.iloc[0] }).")
+        dlq.add_rows(table_name, endpoint_suffix, from_date, to_date, page, rows, reasons)
+    return reject
+
+def load_records_individually(engine, endpoint_suffix, table_name, from_date, to_date, page, raw_json, dlq,
+                              run_id=None, stats=None, fanout=None, batch_rows=MAX_BATCH_ROWS, skip_batches=0):
+    """
+    Fallback for a page that failed part-way: loads each hojin-info of the batches after the first
+    'skip_batches' (already loaded by load_page) on its own, and sends only the records that still
+    fail to the dead-letter queue. A corporation split across batches is retried for its unloaded part.
+    """
+    inserts, updates, rows, dead = 0, 0, 0, 0
+    batches = list(iter_record_batches(table_name, raw_json.get("hojin-infos", []), batch_rows))[skip_batches:]
+
+    for record in (record for batch in batches for record in batch):
+        try:
+            ins, upd, n = load_page(engine, table_name, { "hojin-infos": [ record ] }, run_id=run_id, stats=stats,
+                                    batch_rows=batch_rows, fanout=fanout,
+                                    reject=dead_letter_rows(dlq, table_name, endpoint_suffix, from_date, to_date, page))
+            inserts += ins
+            updates += upd
+            rows += n
+        except Exception as e:
+            dlq.add("record", table_name, endpoint_suffix, from_date, to_date, page, e, payload=record)
+            dead += 1
+
+    logging.warning(f"Page { page } of { table_name }: { dead } record(s) sent to the dead-letter queue.")
+    return inserts, updates, rows
+
+def sync_endpoint(engine, endpoint_suffix, table_name, from_date, to_date, profiler=None,
+                  max_pages=None, cache_dir=None, pages=None, dlq=None, run_id=None, stats=None,
+                  start_page=1, schedule=None, batch_rows=MAX_BATCH_ROWS, identity=None, fanout=None):
     """
     Handles API requests, calls the Master Parser, and upserts to the DB.
+    Pass 'pages' (an iterable of (page, raw_json)) to load from somewhere other than the API.
+    With a 'dlq', failed pages and records are dead-lettered instead of aborting the table.
+    A 'stats' dict (history.new_stats()) collects pages, rows, bytes and stage timings.
+    With a 'schedule' (scheduler.Scheduler), the next page is checkpointed after every page and
+    the table stops between pages once the time budget runs out. The window is only marked done
+    once its last page (or a page without records) is loaded: when 'max_pages' stops it earlier,
+    the page after the limit is checkpointed; on an error the failed page is, and the error raised.
     """
-    headers = {'accept': 'application/json', 'X-hojinInfo-api-token': GBIZ_TOKEN}
-    page = 1
+    profiler = profiler or NullProfiler()
+    stats = stats if stats is not None else history.new_stats()
+    if pages is None:
+        pages = fetch_pages(endpoint_suffix, table_name, from_date, to_date, max_pages, cache_dir, dlq, stats, start_page)
+    pages = iter(pages)
     total_inserts = 0
     total_updates = 0
+    next_page = start_page
+    # Pages of the window, as reported by the last page loaded (None once a page has no records)
+    total_pages = None
 
     print(f"\n>>> Syncing { table_name }...")
 
-    while True:
-        params = { 'page': page, 'from': from_date, 'to': to_date }
-        response = requests.get(f"{ BASE_URL }{ endpoint_suffix }", headers=headers, params=params)
+    try:
+        while True:
+            if schedule and not schedule.can_fetch(table_name):
+                logging.warning(f"Time budget reached: { table_name } stops before page { next_page }.")
+                schedule.checkpoint(table_name, from_date, to_date, next_page, paused=True)
+                return total_inserts, total_updates
 
-        if response.status_code != 200:
-            logging.error(f"Error { response.status_code } on { table_name }")
-            break
+            with profiler.stage(table_name, "fetch"), history.timed(stats, "fetch"):
+                page, raw_json = next(pages, (None, None))
 
-        raw_json = response.json()
-        if not raw_json.get("hojin-infos") or raw_json.get("update_infos"):
-            print(f"    - No new records found for { table_name }.")
-            break
+            if page is None:
+                break
 
-        # --- THE REFACTORED INTEGRATION POINT ---
-        # Instead of manual flattening and renaming, we call our Master Parser.
-        # This one line replaces all the old 'if list_key' logic.
-        df = parse_gbiz_table(table_name, raw_json)
-        # ----------------------------------------
+            if not raw_json.get("hojin-infos") or raw_json.get("update_infos"):
+                print(f"    - No new records found for { table_name }.")
+                total_pages = None
+                break
 
-        if not df.empty:
-            # 1. Temporary Upload for Upsert
-            df.to_sql('temp_upsert', engine, if_exists='replace', index=False)
-
-            pk_map = {
-                "patent_information_gbizinfo": "corporate_number, application_number",
-                "notification_certification_information_gbizinfo": "corporate_number, notification_certification",
-                "award_information_gbizinfo": "corporate_number, award_name",
-                "subsidy_information_gbizinfo": "corporate_number, subsidy",
-                "procurement_information_gbizinfo": "corporate_number, project_name"
-            }
-            pk = pk_map.get(table_name, "corporate_number")
-
-            pk_list = [ p.strip() for p in pk.split(",") ]
-            update_cols = [
-                f'"{ c }" = COALESCE(EXCLUDED."{ c }", { table_name }."{ c }")'
-                for c in df.columns if c not in pk_list
-            ]
-
-            update_stmt = ", ".join(update_cols)
-            cols_str = ", ".join([f'"{ c }"' for c in df.columns])
-
-            # 2. SQL Upsert Logic
-            with engine.begin() as conn:
-                # Note: 'corporate_number' is usually the PK,
-                # but for lists (patents, etc.), you may want to handle conflicts differently.
-                query = f"""
-                    INSERT INTO { table_name } ({ cols_str })
-                    SELECT { cols_str } FROM temp_upsert
-                    ON CONFLICT ({ pk })
-                    DO UPDATE SET { update_stmt }
-                    WHERE { table_name }.* IS DISTINCT FROM EXCLUDED.*
-                    RETURNING (xmax = 0) AS is_insert;
-                """
-                result = conn.execute(text(query))
-                for row in result:
-                    if row.is_insert:
-                        total_inserts += 1
-                    else:
-                        total_updates += 1
+            total_pages = raw_json.get("total_pages", 1)
+            stats["pages"] += 1
+            reject = dead_letter_rows(dlq, table_name, endpoint_suffix, from_date, to_date, page) if dlq else None
+            progress = {}
+            try:
+                ins, upd, rows = load_page(engine, table_name, raw_json, profiler, run_id, stats, batch_rows, identity, fanout,
+                                           reject, progress)
+            except quality.DataQualityError:
+                # A batch-level rule with action 'fail' (or rejected rows without a dlq): abort the table
+                raise
+            except Exception as e:
+                if dlq is None:
+                    raise
+                # Batches before the failed one are committed (and fanned out): only the rest is retried
+                logging.warning(f"Page { page } of { table_name } failed in batch { progress['batches'] + 1 } "
+                                f"({ str(e).splitlines()[0] }); retrying the rest record by record.")
+                ins, upd, rows = load_records_individually(engine, endpoint_suffix, table_name, from_date, to_date,
+                                                           page, raw_json, dlq, run_id, stats, fanout, batch_rows,
+                                                           progress["batches"])
+                ins, upd, rows = progress["inserted"] + ins, progress["updated"] + upd, progress["rows"] + rows
 
-                conn.execute(text("DROP TABLE IF EXISTS temp_upsert"))
-            print(f"    - Page {page}: Processed {len(df)} records.")
+            total_inserts += ins
+            total_updates += upd
+            stats["rows"] += rows
+            if rows:
+                print(f"    - Page {page}: Processed {rows} records.")
 
-        # Check for next page
-        if page >= raw_json.get("total_pages", 1): break
-        page += 1
+            next_page = page + 1
+            if schedule:
+                schedule.checkpoint(table_name, from_date, to_date, next_page)
+    except Exception:
+        if schedule:
+            # Never marked done: the next run resumes the window at the page that failed
+            schedule.checkpoint(table_name, from_date, to_date, next_page)
+        raise
 
+    if schedule:
+        # Pages are fetched up to the last one or the page limit, whichever comes first (see fetch_pages)
+        limit_page = start_page + max_pages if max_pages else None
+        if limit_page and total_pages is not None and limit_page <= total_pages:
+            schedule.checkpoint(table_name, from_date, to_date, limit_page)
+        else:
+            schedule.done(table_name, from_date, to_date)
     return total_inserts, total_updates
 
-def main():
-    if not DB_URL:
-        logging.error("DB_URL is missing!")
-        return
+def retry_dead_letters(engine, dlq, tables=None, run_id=None, fanout=None, batch_rows=MAX_BATCH_ROWS):
+    """
+    Replays dead-lettered windows, pages, records and rows. Returns { table: (inserts, updates, retried, still_dead) }.
+    A 'sink' entry (a batch an extra target rejected) is written to that target only.
+    A 'window' entry re-syncs its window from the saved page on (and clears its saved progress
+    once it is done); any page that fails to fetch again fails the whole entry, so it is not
+    dead-lettered twice.
+    """
+    results = {}
+    succeeded, failed = [], {}
 
-    engine = create_engine(DB_URL)
-    # Define your date range (e.g., last 32 days)
-    to_date = datetime.now().strftime('%Y%m%d')
-    from_date = datetime(2025, 9, 1).strftime('%Y%m%d')
-    # from_date = (datetime.now() - timedelta(days=32)).strftime('%Y%m%d')
+    for entry in dlq.load(tables):
+        table_name = entry["table"]
+        ins, upd, retried, dead = results.get(table_name, (0, 0, 0, 0))
 
-    report_data = []
-    total_tables = len(ENDPOINTS_MAP)
+        try:
+            if entry["kind"] == "window":
+                pages = fetch_pages(entry["endpoint"], table_name, entry["from"], entry["to"], start_page=entry["page"])
+                i, u = sync_endpoint(engine, entry["endpoint"], table_name, entry["from"], entry["to"], pages=pages,
+                                     dlq=dlq, run_id=run_id, start_page=entry["page"],
+                                     schedule=scheduler.Scheduler(engine, run_id), batch_rows=batch_rows, fanout=fanout)
+            elif entry["kind"] == "sink":
+                import pandas as pd
 
-    # Iterate through the Map we defined earlier
-    for suffix, table in ENDPOINTS_MAP.items():
+                sink = fanout.find(entry["payload"]["target"]) if fanout else None
+                if sink is None:
+                    raise RuntimeError(f"Target { entry['payload']['target'] } is not configured for this run")
+                i, u = sink.write(sink.engine, table_name, pd.DataFrame(entry["payload"]["rows"]), run_id)
+            elif entry["kind"] == "row":
+                import pandas as pd
+
+                df, rejected, reasons = quality.check(table_name, pd.DataFrame([ entry["payload"] ]))
+                if not rejected.empty:
+                    raise quality.DataQualityError(table_name, list(reasons))
+                i, u = upsert_dataframe(engine, table_name, df, run_id)
+                if fanout:
+                    fanout.submit(table_name, df, run_id)
+            else:
+                if entry["kind"] == "page":
+                    raw_json = fetch_page(entry["endpoint"], table_name, entry["from"], entry["to"], entry["page"])
+                else:
+                    raw_json = { "hojin-infos": [ entry["payload"] ] }
+                reject = dead_letter_rows(dlq, table_name, entry["endpoint"], entry["from"], entry["to"], entry["page"])
+                i, u, _ = load_page(engine, table_name, raw_json, run_id=run_id, batch_rows=batch_rows, fanout=fanout, reject=reject)
+            ins, upd = ins + i, upd + u
+            succeeded.append(entry["id"])
+        except Exception as e:
+            logging.error(f"Dead letter { entry['id'] } ({ table_name }, page { entry['page'] }) still failing: { e }")
+            failed[entry["id"]] = e
+            dead += 1
+
+        results[table_name] = (ins, upd, retried + 1, dead)
+
+    remaining = dlq.settle(succeeded, failed)
+    logging.info(f"Retried { len(succeeded) + len(failed) } dead letter(s): { len(succeeded) } recovered, { remaining } left.")
+    return results
+
+def run_tables(engine, tables, from_date, to_date, profiler=None, workers=1, max_pages=None,
+               cache_dir=None, replay=False, dlq=None, run_id=None, start_pages=None, schedule=None,
+               batch_rows=MAX_BATCH_ROWS, identity=None, fanout=None):
+    """
+    Syncs every selected table and returns one report row per table.
+    'start_pages' ({ table: page }) resumes tables part-way through the window.
+    'identity' (an IdentityCache) and 'fanout' (sinks.FanOut) are shared by all tables of the run.
+    """
+    profiler = profiler or NullProfiler()
+
+    def run_one(table):
+        suffix = TABLE_ENDPOINTS[table]
         logging.info(f'Starting sync for table: { table }')
-        
+        dead_before = dlq.counts.get(table, 0) if dlq else 0
+
+        stats = history.new_stats()
+        start_time = time.time()
+        start_page = (start_pages or {}).get(table, 1)
+        if start_page > 1:
+            logging.info(f"Resuming { table } ({ from_date } - { to_date }) at page { start_page }.")
+
         try:
-            start_time = time.time()
-            ins, upd = sync_endpoint(engine, suffix, table, from_date, to_date)
-            
+            pages = iter_cached_pages(cache_dir, table, from_date, to_date, max_pages, stats, start_page) if replay else None
+            with profiler.table(table):
+                ins, upd = sync_endpoint(engine, suffix, table, from_date, to_date, profiler,
+                                         max_pages=max_pages, cache_dir=cache_dir, pages=pages, dlq=dlq,
+                                         run_id=run_id, stats=stats, start_page=start_page, schedule=schedule,
+                                         batch_rows=batch_rows, identity=identity, fanout=fanout)
+
             duration = time.time() - start_time
-            logging.info(f'✅ Finished { table }: { ins } inserted, { upd } updated. ({duration:.2f} seconds).')
-            
-            report_data.append({
+            dead = (dlq.counts.get(table, 0) if dlq else 0) - dead_before
+            paused = schedule is not None and (table, from_date, to_date) in schedule.paused
+            logging.info(f'{ "⏸️ Paused" if paused else "✅ Finished" } { table }: { ins } inserted, { upd } updated, { dead } dead-lettered. ({duration:.2f} seconds).')
+
+            return {
                 'table': table,
-                'status': "✅" if (ins + upd) > 0 else "💤",
+                'status': "⚠️" if dead else "⏸️" if paused else "✅" if (ins + upd) > 0 else "💤",
                 'inserted': ins,
-                'updated': upd
-            })
+                'updated': upd,
+                'dead_letters': dead,
+                'duration': duration,
+                **stats
+            }
         except Exception as e:
             logging.error(f"Failed to sync { table }: { e }")
-            report_data.append({
+            return {
                 "table": table,
                 "status": "❌ Error",
                 "inserted": 0,
-                "updated": 0
-            })
+                "updated": 0,
+                "dead_letters": (dlq.counts.get(table, 0) if dlq else 0) - dead_before,
+                "duration": time.time() - start_time,
+                **stats
+            }
+
+    if workers <= 1:
+        return [run_one(table) for table in tables]
 
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_one, tables))
+
+def write_summary(report_data, from_date, to_date, profile_artifacts=None, title="Daily Sync Report", notes=None,
+                  targets=None):
     with open("summary.md", "w", encoding="utf-8") as f:
-        f.write("## 🚀 gBizInfo Daily Sync Report\n")
-        f.write(f"**Date Range:** `{ from_date }` to `{ to_date }`\n\n")
-        f.write("| Table Name | Status | New Inserts | Updates |\n")
-        f.write("| :--- | :---: | :---: | :---: |\n")
+        f.write(f"## 🚀 gBizInfo { title }\n")
+        if from_date:
+            f.write(f"**Date Range:** `{ from_date }` to `{ to_date }`\n")
+        f.write("\n")
+        f.write("| Table Name | Status | New Inserts | Updates | Dead Letters |\n")
+        f.write("| :--- | :---: | :---: | :---: | :---: |\n")
 
         for item in report_data:
-            f.write(f"| { item['table'] } | { item['status'] } | { item['inserted'] } | { item['updated'] } |\n")
+            f.write(f"| { item['table'] } | { item['status'] } | { item['inserted'] } | { item['updated'] } | { item.get('dead_letters', 0) } |\n")
+
+        if notes:
+            f.write("\n")
+            for note in notes:
+                f.write(f"- { note }\n")
+
+        timed_items = [ item for item in report_data if "duration" in item ]
+        if timed_items:
+            f.write("\n### ⏱️ Performance\n")
+            f.write("| Table Name | Duration (s) | Pages | Rows | Collapsed | MB | Rows/s | Baseline Rows/s | Change | Fetch / Parse / Upsert (s) |\n")
+            f.write("| :--- | ---: | ---: | ---: | ---: | ---: | ---: | ---: | :---: | :---: |\n")
+            for item in timed_items:
+                rps = history.throughput(item)
+                baseline = item.get("baseline_rps")
+                change = item.get("rps_change")
+                change_str = "-" if change is None else f"{ '🐢 ' if item.get('regressed') else '' }{ change:+.0%}"
+                stages = item.get("stage_seconds", {})
+                stages_str = " / ".join(f"{ stages.get(s, 0):.1f}" for s in ("fetch", "parse", "upsert"))
+                f.write(
+                    f"| { item['table'] } | { item['duration']:.1f} | { item.get('pages', 0) } | { item.get('rows', 0) } | { item.get('collapsed', 0) } "
+                    f"| { item.get('bytes', 0) / 1e6:.1f} | { '-' if rps is None else f'{ rps:.0f}' } "
+                    f"| { '-' if baseline is None else f'{ baseline:.0f}' } | { change_str } | { stages_str } |\n"
+                )
+
+        if targets:
+            f.write("\n### 🛰️ Extra Targets\n")
+            f.write("| Target | Batches | Rows | New Inserts | Updates | Failed Batches | Retries | Max Lag (s) | Sync Waited (s) |\n")
+            f.write("| :--- | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: |\n")
+            for name, stats in targets:
+                f.write(f"| `{ name }` | { stats['batches'] } | { stats['rows'] } | { stats['inserted'] } | { stats['updated'] } "
+                        f"| { stats['failed'] } | { stats['retries'] } | { stats['max_lag']:.1f} | { stats['stalled']:.1f} |\n")
+
+        checked_items = [ item for item in report_data if item.get("quality", {}).get("rows") ]
+        if checked_items:
+            f.write("\n### 🧪 Data Quality\n")
+            f.write("| Table Name | Rows Checked | Repeated Keys | Rejected Rows | Most Empty Columns | Never Populated |\n")
+            f.write("| :--- | ---: | ---: | ---: | :--- | :--- |\n")
+            for item in checked_items:
+                stats = item["quality"]
+                never, rates = quality.summarize(item["table"], stats)
+                rates_str = ", ".join(f"{ c } { r:.2%}" for c, r in rates[:quality.SUMMARY_COLUMNS]) or "-"
+                never_str = ", ".join(never[:quality.SUMMARY_COLUMNS]) + (f" (+{ len(never) - quality.SUMMARY_COLUMNS })" if len(never) > quality.SUMMARY_COLUMNS else "")
+                f.write(f"| { item['table'] } | { stats['rows'] } | { stats['duplicates'] } | { stats['rejected'] } "
+                        f"| { rates_str } | { never_str or '-' } |\n")
+
+        if profile_artifacts:
+            f.write("\n### 🔬 Profiling Artifacts\n")
+            f.write("| Table Name | Stage | Artifact |\n")
+            f.write("| :--- | :--- | :--- |\n")
+            for (table, stage), kind, path in profile_artifacts:
+                f.write(f"| { table } | { stage } | [{ kind }]({ path }) |\n")
 
     print("\n>>> Sync complete. Summary generated in summary.md")
 
+# --- COMMAND LINE ---
+
+TABLE_ENDPOINTS = { table: suffix for suffix, table in ENDPOINTS_MAP.items() }
+
+def resolve_tables(names):
+    """Accepts full table names, endpoint names ('patent') or table prefixes ('corporate_basic')."""
+    if not names:
+        return list(ENDPOINTS_MAP.values())
+
+    selected = []
+    for name in names:
+        name = name.strip().strip("/")
+        matches = [
+            table for suffix, table in ENDPOINTS_MAP.items()
+            if name == table or (suffix and name == suffix.strip("/")) or table.startswith(name)
+        ]
+        if len(matches) != 1:
+            raise ValueError(f"Unknown or ambiguous table '{ name }'. Choose from: { ', '.join(ENDPOINTS_MAP.values()) }")
+        if matches[0] not in selected:
+            selected.append(matches[0])
+    return selected
+
+def parse_date(value):
+    """argparse type for YYYYMMDD or YYYY-MM-DD dates, returned as YYYYMMDD."""
+    for fmt in ("%Y%m%d", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y%m%d')
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"Invalid date '{ value }' (expected YYYYMMDD or YYYY-MM-DD)")
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Invalid value '{ value }' (expected a positive integer)")
+    return number
+
+def non_negative_int(value):
+    """argparse type for counts that may be 0 (e.g. retries)."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"Invalid value '{ value }' (expected 0 or a positive integer)")
+    return number
+
+def sink_spec(value):
+    """argparse type for --sink: checks the URL's '#retries=..&buffer=..&workers=..' fragment."""
+    try:
+        sinks.parse_sink(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+def date_windows(from_date, to_date, days):
+    """Splits [from_date, to_date] into consecutive windows of at most 'days' days."""
+    if days < 1:
+        raise ValueError(f"Window size must be at least 1 day, got { days }")
+    start = datetime.strptime(from_date, '%Y%m%d')
+    end = datetime.strptime(to_date, '%Y%m%d')
+    while start <= end:
+        window_end = min(start + timedelta(days=days - 1), end)
+        yield start.strftime('%Y%m%d'), window_end.strftime('%Y%m%d')
+        start = window_end + timedelta(days=1)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="gBizInfo sync")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    # Option groups, so each command only takes the options it honours
+    tables = argparse.ArgumentParser(add_help=False)
+    tables.add_argument("--tables", nargs="+", metavar="TABLE",
+                        help="Tables to process (full name, endpoint name like 'patent', or prefix). Default: all")
+
+    window = argparse.ArgumentParser(add_help=False)
+    window.add_argument("--from", dest="from_date", type=parse_date, default=DEFAULT_FROM_DATE,
+                        help=f"Start date, YYYYMMDD (default: { DEFAULT_FROM_DATE })")
+    window.add_argument("--to", dest="to_date", type=parse_date, default=None,
+                        help="End date, YYYYMMDD (default: today)")
+
+    load = argparse.ArgumentParser(add_help=False)
+    load.add_argument("--batch-rows", type=positive_int, default=MAX_BATCH_ROWS,
+                      help="Upsert each page in batches of at most this many flattened rows")
+    load.add_argument("--sink", dest="sinks", action="append", type=sink_spec, default=None, metavar="URL",
+                      help="Extra database to write every batch to (repeatable; default: $SINK_URLS). "
+                           "Per-target options go in the fragment: URL#retries=5&buffer=16&workers=2")
+    load.add_argument("--sink-retries", type=non_negative_int, default=sinks.DEFAULT_RETRIES,
+                      help="Attempts per batch and extra target after the first one")
+    load.add_argument("--sink-buffer", type=positive_int, default=sinks.DEFAULT_BUFFER,
+                      help="Batches queued per extra-target writer before the sync waits for it")
+    load.add_argument("--sink-workers", type=positive_int, default=sinks.DEFAULT_WORKERS,
+                      help="Writer threads (and pooled connections) per extra target")
+    load.add_argument("--changelog-retention-days", type=positive_int, default=changelog.DEFAULT_RETENTION_DAYS,
+                      help="Delete change-feed entries older than this")
+    load.add_argument("--changelog-compact-days", type=positive_int, default=changelog.DEFAULT_COMPACT_AFTER_DAYS,
+                      help="Collapse change-feed entries older than this to the latest one per key")
+
+    pages = argparse.ArgumentParser(add_help=False)
+    pages.add_argument("--max-pages", type=positive_int, default=None,
+                       help="Stop each table after this many pages")
+    pages.add_argument("--workers", type=positive_int, default=1,
+                       help="Number of tables synced in parallel")
+    pages.add_argument("--baseline-runs", type=positive_int, default=history.DEFAULT_BASELINE_RUNS,
+                       help="Number of recent runs per table used as the throughput baseline")
+    pages.add_argument("--regression-threshold", type=float, default=history.DEFAULT_REGRESSION_THRESHOLD,
+                       help="Flag tables whose rows/s dropped by more than this fraction of the baseline")
+    pages.add_argument("--profile", action="store_true",
+                       help="Run under cProfile, a stack sampler and tracemalloc, per table and stage")
+    pages.add_argument("--profile-dir", default="profile_artifacts",
+                       help="Directory for pstats, collapsed stacks and allocation reports")
+
+    budget = argparse.ArgumentParser(add_help=False)
+    budget.add_argument("--time-budget", type=float, default=None, metavar="MINUTES",
+                        help="Stop cleanly before this many minutes; unfinished windows resume next run")
+    budget.add_argument("--deadline-margin", type=float, default=scheduler.DEFAULT_MARGIN_SECONDS, metavar="SECONDS",
+                        help="Part of the time budget kept free for the end-of-run steps")
+
+    p = sub.add_parser("sync", parents=[tables, window, load, pages, budget], help="Fetch updates from the API and upsert them")
+    p.add_argument("--cache-dir", default=None,
+                   help="Also save every raw API page here so it can be replayed later")
+
+    p = sub.add_parser("replay", parents=[tables, window, load, pages], help="Upsert pages previously saved with --cache-dir")
+    p.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    p.add_argument("--all-windows", action="store_true",
+                   help="Replay every cached date window instead of only --from/--to")
+
+    p = sub.add_parser("backfill", parents=[tables, window, load, pages, budget], help="Sync a long date range in fixed-size windows")
+    p.add_argument("--window-days", type=positive_int, default=30)
+    p.add_argument("--cache-dir", default=None)
+
+    p = sub.add_parser("retry-dlq", parents=[tables, load], help="Replay only the dead-lettered pages and records")
+    # Dead letters carry their own windows and pages; they are retried one at a time, unprofiled
+    p.set_defaults(from_date=None, to_date=None, workers=1, profile=False, profile_dir=None)
+
+    p = sub.add_parser("refresh-profile", help=f"Recompute { corporate_profile.PROFILE_TABLE } rows")
+    p.add_argument("--run-id", default=None, help="Only corporations touched by this run")
+    p.add_argument("--all", action="store_true", help="Rebuild every corporation")
+
+    p = sub.add_parser("migrate", parents=[tables], help="Create/migrate tables, conflict-key indexes and partitions")
+    p.add_argument("--repartition", action="store_true",
+                   help="Convert PARTITION_CONFIG tables that are plain or partitioned on their raw date (copies every row)")
+
+    # Reconcile compares every cached window with the whole table, so it takes no --from/--to
+    p = sub.add_parser("reconcile", parents=[tables], help="Compare bucket hashes of cached pages and the DB, re-sync drifted corporations")
+    p.add_argument("--batch-rows", type=positive_int, default=MAX_BATCH_ROWS,
+                   help="Parse cached pages and repair drift in batches of at most this many rows")
+    p.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    p.add_argument("--sample", type=float, default=1.0,
+                   help=f"Fraction of the { 10 ** reconcile.SAMPLE_DEPTH } corporate_number prefix buckets to check")
+    p.add_argument("--seed", type=int, default=None, help="Seed for the bucket sample")
+    p.add_argument("--leaf-size", type=positive_int, default=reconcile.LEAF_SIZE,
+                   help="Stop splitting a mismatched bucket once it has at most this many rows")
+    p.add_argument("--dry-run", action="store_true", help="Report drift without re-syncing")
+
+    sub.add_parser("status", parents=[tables], help="Show configured tables and, if DB_URL is set, their row counts")
+
+    return parser
+
+def cmd_status(args):
+    tables = args.tables
+    counts = {}
+
+    if DB_URL:
+        from sqlalchemy import create_engine, text
+
+        engine = create_engine(DB_URL)
+        with engine.connect() as conn:
+            for table in tables:
+                try:
+                    counts[table] = conn.execute(text(f"SELECT count(*) FROM { table }")).scalar()
+                except Exception as e:
+                    conn.rollback()
+                    counts[table] = f"error: { str(e).splitlines()[0] }"
+
+    for table in tables:
+        endpoint = TABLE_ENDPOINTS[table] or "/"
+        print(f"{ table:<50} { endpoint:<16} { counts.get(table, '-') }")
+
+def cmd_migrate(args):
+    if not DB_URL:
+        logging.error("DB_URL is missing!")
+        return
+
+    from sqlalchemy import create_engine
+
+    engine = create_engine(DB_URL)
+    actions = schema.ensure_schema(engine, args.tables, repartition=args.repartition)
+    changelog.ensure_changelog_table(engine)
+    corporate_profile.ensure_profile_table(engine)
+    scheduler.ensure_progress_table(engine)
+    ensure_dlq_table(engine)
+    if not actions:
+        logging.info("Schema is up to date.")
+
+def cmd_reconcile(args):
+    if not DB_URL:
+        logging.error("DB_URL is missing!")
+        return
+
+    from sqlalchemy import create_engine
+
+    engine = create_engine(DB_URL)
+    schema.ensure_schema(engine, args.tables)
+    changelog.ensure_changelog_table(engine)
+    corporate_profile.ensure_profile_table(engine)
+    run_id = changelog.new_run_id()
+    prefixes = reconcile.sample_prefixes(args.sample, args.seed)
+    results = []
+    refreshed = 0
+
+    for table in args.tables:
+        try:
+            frames = iter_cached_frames(args.cache_dir, table, prefixes, args.batch_rows)
+            staged, cols, source_rows = reconcile.stage_source(engine, table, frames)
+            if not source_rows:
+                logging.info(f"No cached pages for { table } in the sampled buckets.")
+                continue
+
+            drifted, stats = reconcile.find_drift(engine, table, staged, cols, prefixes, leaf_size=args.leaf_size)
+            ins = upd = 0
+            remaining = len(drifted)
+
+            if drifted and not args.dry_run:
+                for df in reconcile.read_source(engine, table, cols, drifted, args.batch_rows):
+                    i, u = upsert_dataframe(engine, table, df, run_id)
+                    ins, upd = ins + i, upd + u
+                remaining = len(reconcile.find_drift(engine, table, staged, cols, prefixes, leaf_size=args.leaf_size)[0])
+        finally:
+            reconcile.drop_source(engine, table)
+
+        logging.info(f"{ table }: { len(drifted) } drifted corporation(s), { ins } inserted, { upd } updated, { remaining } still different.")
+        results.append({ "table": table, "source_rows": source_rows, "drifted": len(drifted),
+                         "inserted": ins, "updated": upd, "remaining": remaining, **stats })
+
+    if any(item["inserted"] + item["updated"] for item in results):
+        # Repairs went through the changelog under this run's id, like a sync
+        refreshed = corporate_profile.refresh_profiles(engine, run_id)
+        logging.info(f"Refreshed { refreshed } rows of { corporate_profile.PROFILE_TABLE }.")
+
+    with open("summary.md", "w", encoding="utf-8") as f:
+        f.write("## 🔍 gBizInfo Reconciliation Report\n")
+        f.write(f"**Sampled buckets:** { len(prefixes) } / { 10 ** reconcile.SAMPLE_DEPTH }{ ' (dry run)' if args.dry_run else '' }\n")
+        f.write(f"**Corporate profiles refreshed:** { refreshed }\n\n")
+        f.write("| Table Name | Source Rows | Buckets Compared | Mismatched | Drifted Corporations | Inserts | Updates | Still Different |\n")
+        f.write("| :--- | ---: | ---: | ---: | ---: | ---: | ---: | ---: |\n")
+        for item in results:
+            f.write(f"| { item['table'] } | { item['source_rows'] } | { item['buckets_compared'] } | { item['buckets_mismatched'] } "
+                    f"| { item['drifted'] } | { item['inserted'] } | { item['updated'] } | { item['remaining'] } |\n")
+
+    print("\n>>> Reconciliation complete. Summary generated in summary.md")
+
+def cmd_refresh_profile(args):
+    if not DB_URL:
+        logging.error("DB_URL is missing!")
+        return
+    if not args.all and not args.run_id:
+        logging.error("Pass --run-id or --all.")
+        return
+
+    from sqlalchemy import create_engine
+
+    engine = create_engine(DB_URL)
+    corporate_profile.ensure_profile_table(engine)
+    refreshed = corporate_profile.refresh_profiles(engine, None if args.all else args.run_id)
+    logging.info(f"Refreshed { refreshed } rows of { corporate_profile.PROFILE_TABLE }.")
+
+def cmd_sync(args):
+    if not DB_URL:
+        logging.error("DB_URL is missing!")
+        return
+
+    from sqlalchemy import create_engine
+
+    engine = create_engine(DB_URL, pool_size=max(5, args.workers))
+    tables = args.tables
+    to_date = args.to_date or datetime.now().strftime('%Y%m%d')
+    from_date = args.from_date
+
+    workers = args.workers
+    if args.profile and workers > 1:
+        logging.warning("--profile samples a single thread; running with --workers 1.")
+        workers = 1
+
+    profiler = make_profiler(args.profile, args.profile_dir)
+    profiler.start()
+    run_id = changelog.new_run_id()
+    dlq = DeadLetterQueue(engine, run_id)
+    notes = []
+    schema.ensure_schema(engine, tables)
+    changelog.ensure_changelog_table(engine)
+    corporate_profile.ensure_profile_table(engine)
+    history.ensure_history_table(engine)
+    ensure_dlq_table(engine)
+    scheduler.ensure_progress_table(engine)
+
+    fanout = sinks.FanOut(args.sinks or SINK_URLS, upsert_dataframe, args.sink_retries, args.sink_buffer,
+                          args.sink_workers, dlq=dlq)
+    for sink in list(fanout.sinks):
+        # One unreachable or broken target must not stop the run or the other targets
+        try:
+            changelog.ensure_changelog_table(sink.engine)
+            corporate_profile.ensure_profile_table(sink.engine)
+            schema.ensure_schema(sink.engine, tables)
+        except Exception as e:
+            logging.error(f"Target { sink.name } disabled for this run: { str(e).splitlines()[0] }")
+            notes.append(f"❌ Target { sink.name } disabled: { str(e).splitlines()[0] }")
+            fanout.disable(sink)
+    identity = IdentityCache()
+    logging.info(f"Run id: { run_id }")
+
+    if args.command in ("sync", "backfill"):
+        page_seconds = scheduler.estimate_page_seconds(engine, tables, args.baseline_runs)
+        budget = args.time_budget * 60 if args.time_budget else None
+        schedule = scheduler.Scheduler(engine, run_id, budget, args.deadline_margin, page_seconds)
+        if budget:
+            estimates = ", ".join(f"{ t }: { s:.1f}s" for t, s in page_seconds.items()) or "no history yet"
+            logging.info(f"Time budget: { args.time_budget:g} min. Estimated seconds per page: { estimates }")
+
+        windows = list(date_windows(from_date, to_date, args.window_days)) if args.command == "backfill" else [ (from_date, to_date) ]
+        report_data = []
+        for (window_from, window_to), window_tables, start_pages in schedule.plan(tables, windows):
+            if (window_from, window_to) != (from_date, to_date):
+                logging.info(f"Window { window_from } - { window_to }")
+            report_data.extend(run_tables(engine, window_tables, window_from, window_to, profiler, workers,
+                                          args.max_pages, args.cache_dir, dlq=dlq, run_id=run_id,
+                                          start_pages=start_pages, schedule=schedule, batch_rows=args.batch_rows,
+                                          identity=identity, fanout=fanout))
+        report_data = merge_reports(report_data)
+
+        if schedule.paused:
+            notes.append(f"⏸️ Time budget reached: { len(schedule.paused) } table window(s) saved in "
+                         f"{ scheduler.PROGRESS_TABLE }; the next run resumes them first.")
+    elif args.command == "replay":
+        window = (None, None) if args.all_windows else (from_date, to_date)
+        report_data = run_tables(engine, tables, *window, profiler, workers, args.max_pages,
+                                 args.cache_dir, replay=True, dlq=dlq, run_id=run_id, batch_rows=args.batch_rows,
+                                 identity=identity, fanout=fanout)
+    else:
+        report_data = []
+        for table, (ins, upd, retried, dead) in retry_dead_letters(engine, dlq, tables, run_id, fanout, args.batch_rows).items():
+            report_data.append({
+                "table": table,
+                "status": "⚠️" if dead else "✅",
+                "inserted": ins,
+                "updated": upd,
+                "dead_letters": dead
+            })
+
+    targets = fanout.close()
+    for sink in fanout.sinks:
+        try:
+            corporate_profile.refresh_profiles(sink.engine, run_id)
+            changelog.compact_changelog(sink.engine, args.changelog_compact_days)
+            changelog.prune_changelog(sink.engine, args.changelog_retention_days)
+        except Exception as e:
+            logging.error(f"End-of-run maintenance failed on { sink.name }: { str(e).splitlines()[0] }")
+        if sink.stats["failed"]:
+            notes.append(f"❌ { sink.stats['failed'] } batch(es) could not be written to { sink.name } (dead-lettered for retry-dlq)")
+
+    try:
+        refreshed = corporate_profile.refresh_profiles(engine, run_id)
+        notes.append(f"Corporate profiles refreshed: { refreshed }")
+    except Exception as e:
+        logging.error(f"Failed to refresh { corporate_profile.PROFILE_TABLE }: { e }")
+        notes.append(f"❌ Corporate profile refresh failed: { str(e).splitlines()[0] }")
+
+    if args.command != "retry-dlq":
+        baselines = history.load_baselines(engine, tables, args.command, args.baseline_runs)
+        regressed = history.flag_regressions(report_data, baselines, args.regression_threshold)
+        if regressed:
+            logging.warning(f"Throughput regression in: { ', '.join(regressed) }")
+            notes.append(f"🐢 Throughput dropped more than { args.regression_threshold:.0%} below baseline: { ', '.join(regressed) }")
+        history.record_run(engine, run_id, args.command, from_date, to_date, report_data)
+
+    compacted = changelog.compact_changelog(engine, args.changelog_compact_days)
+    pruned = changelog.prune_changelog(engine, args.changelog_retention_days)
+    logging.info(f"Changelog maintenance: { compacted } entries compacted, { pruned } pruned.")
+
+    profile_artifacts = profiler.stop()
+    title = {
+        "sync": "Daily Sync Report",
+        "replay": "Replay Report",
+        "backfill": "Backfill Report",
+        "retry-dlq": "Dead-Letter Retry Report"
+    }[args.command]
+    write_summary(report_data, from_date, to_date, profile_artifacts, title, notes, targets)
+
+def merge_reports(report_data):
+    """Folds per-window report rows into one row per table."""
+    merged = {}
+    for item in report_data:
+        row = merged.setdefault(item["table"], {
+            "table": item["table"], "status": "💤", "inserted": 0, "updated": 0, "dead_letters": 0, "duration": 0.0,
+            **history.new_stats()
+        })
+        for key in ("inserted", "updated", "dead_letters", "duration", "pages", "rows", "collapsed", "bytes"):
+            row[key] += item.get(key, 0)
+        for stage, seconds in item.get("stage_seconds", {}).items():
+            row["stage_seconds"][stage] = row["stage_seconds"].get(stage, 0.0) + seconds
+        if "quality" in item:
+            quality.merge_stats(row["quality"], item["quality"])
+        # Worst status wins
+        rank = [ "💤", "✅", "⏸️", "⚠️", "❌ Error" ]
+        row["status"] = max(row["status"], item["status"], key=rank.index)
+    return list(merged.values())
+
+COMMANDS = {
+    "sync": cmd_sync,
+    "replay": cmd_sync,
+    "backfill": cmd_sync,
+    "retry-dlq": cmd_sync,
+    "migrate": cmd_migrate,
+    "reconcile": cmd_reconcile,
+    "refresh-profile": cmd_refresh_profile,
+    "status": cmd_status
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Plain 'python script.py' (the scheduled job) keeps meaning 'sync'
+    if not argv or argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        argv = ["sync", *argv]
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if "tables" in vars(args):
+        try:
+            args.tables = resolve_tables(args.tables)
+        except ValueError as e:
+            parser.error(str(e))
+
+    COMMANDS[args.command](args)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,163 @@
+"""
+Fan-out of parsed batches to extra databases (reporting replica, archive) next to DB_URL.
+
+The primary database is still written inline. Every batch it accepts is then queued once
+per extra target, so the API is called and pages are parsed only once. Each target has its
+own engine and pool, writer threads, retry policy and lag statistics. A slow target only
+holds up the sync once its bounded queue is full. All batches of one table go to the same
+writer thread, so a target applies them in the order the primary did. A batch that still
+fails after its retries is dead-lettered as a 'sink' entry, for retry-dlq to write later.
+"""
+import logging
+import queue
+import threading
+import time
+from urllib.parse import parse_qsl
+
+DEFAULT_RETRIES = 3
+# Batches that may wait per writer thread before the sync blocks on that target
+DEFAULT_BUFFER = 8
+DEFAULT_WORKERS = 1
+RETRY_BACKOFF_SECONDS = 1.0
+
+
+def parse_sink(spec, retries=DEFAULT_RETRIES, buffer=DEFAULT_BUFFER, workers=DEFAULT_WORKERS):
+    """'URL' or 'URL#retries=5&buffer=16&workers=2' -> (url, options)."""
+    url, _, fragment = spec.partition("#")
+    options = { "retries": retries, "buffer": buffer, "workers": workers }
+    for key, value in parse_qsl(fragment):
+        if key not in options:
+            raise ValueError(f"Unknown sink option '{ key }' (choose from { ', '.join(options) })")
+        options[key] = int(value)
+    check_options(**options)
+    return url, options
+
+
+def check_options(retries, buffer, workers):
+    """Raises ValueError for options a Sink can't run with (a buffer below 1 would make its queues unbounded)."""
+    if retries < 0:
+        raise ValueError(f"Sink option 'retries' must be at least 0, got { retries }")
+    if buffer < 1:
+        raise ValueError(f"Sink option 'buffer' must be at least 1, got { buffer }")
+    if workers < 1:
+        raise ValueError(f"Sink option 'workers' must be at least 1, got { workers }")
+
+
+class Sink:
+    """One extra target database with its own writer threads and bounded queues."""
+
+    def __init__(self, url, write, retries=DEFAULT_RETRIES, buffer=DEFAULT_BUFFER, workers=DEFAULT_WORKERS, dlq=None):
+        from sqlalchemy import create_engine
+        from sqlalchemy.engine import make_url
+
+        self.name = make_url(url).render_as_string(hide_password=True)
+        check_options(retries, buffer, workers)
+        self.engine = create_engine(url, pool_size=workers + 1)
+        self.write = write
+        self.retries = retries
+        self.dlq = dlq
+        self.stats = { "batches": 0, "rows": 0, "inserted": 0, "updated": 0, "failed": 0, "retries": 0,
+                       "max_lag": 0.0, "stalled": 0.0 }
+        self._lock = threading.Lock()
+        self._queues = [ queue.Queue(maxsize=buffer) for _ in range(workers) ]
+        self._threads = [
+            threading.Thread(target=self._run, args=(q,), name=f"sink-{ i }", daemon=True) for i, q in enumerate(self._queues)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, table_name, df, run_id):
+        """Queues a batch; blocks only while this table's writer queue is full."""
+        q = self._queues[sum(table_name.encode()) % len(self._queues)]
+        submitted = time.monotonic()
+        q.put((table_name, df, run_id, submitted))
+        waited = time.monotonic() - submitted
+        with self._lock:
+            self.stats["stalled"] += waited
+
+    def _run(self, q):
+        while True:
+            job = q.get()
+            try:
+                if job is None:
+                    return
+                self._write(*job)
+            finally:
+                q.task_done()
+
+    def _write(self, table_name, df, run_id, submitted):
+        ins = upd = 0
+        for attempt in range(self.retries + 1):
+            try:
+                ins, upd = self.write(self.engine, table_name, df, run_id)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    logging.error(f"Target { self.name }: { table_name } batch of { len(df) } rows failed after "
+                                  f"{ attempt + 1 } attempt(s): { str(e).splitlines()[0] }")
+                    with self._lock:
+                        self.stats["failed"] += 1
+                    self._dead_letter(table_name, df, e)
+                    return
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+        lag = time.monotonic() - submitted
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["rows"] += len(df)
+            self.stats["inserted"] += ins
+            self.stats["updated"] += upd
+            self.stats["max_lag"] = max(self.stats["max_lag"], lag)
+
+    def _dead_letter(self, table_name, df, error):
+        if self.dlq is None:
+            return
+        rows = df.astype(object).where(df.notna(), None).to_dict("records")
+        try:
+            self.dlq.add("sink", table_name, None, None, None, None, error, payload={ "target": self.name, "rows": rows })
+        except Exception as e:
+            logging.error(f"Target { self.name }: could not dead-letter a { table_name } batch: { str(e).splitlines()[0] }")
+
+    def backlog(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def close(self):
+        """Waits until every queued batch is written and stops the writer threads."""
+        for q in self._queues:
+            q.put(None)
+        for t in self._threads:
+            t.join()
+
+
+class FanOut:
+    """The extra targets of a run. Falsy when there are none."""
+
+    def __init__(self, specs, write, retries=DEFAULT_RETRIES, buffer=DEFAULT_BUFFER, workers=DEFAULT_WORKERS, dlq=None):
+        self.sinks = [
+            Sink(url, write, dlq=dlq, **options) for url, options in (parse_sink(s, retries, buffer, workers) for s in specs)
+        ]
+
+    def __bool__(self):
+        return bool(self.sinks)
+
+    def submit(self, table_name, df, run_id):
+        for sink in self.sinks:
+            sink.submit(table_name, df, run_id)
+
+    def find(self, name):
+        return next((sink for sink in self.sinks if sink.name == name), None)
+
+    def disable(self, sink):
+        """Stops writing to one target for the rest of the run (e.g. it could not be set up)."""
+        self.sinks.remove(sink)
+        sink.close()
+        sink.engine.dispose()
+
+    def close(self):
+        for sink in self.sinks:
+            if sink.backlog():
+                logging.info(f"Waiting for { sink.backlog() } queued batch(es) on { sink.name }...")
+            sink.close()
+        return [ (sink.name, sink.stats) for sink in self.sinks ]
@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+import script
+
+PATENT = "patent_information_gbizinfo"
+FINANCE = "financial_information_gbizinfo"
+
+
+def _patents(number, count):
+    return { "corporate_number": number, "patent": [ { "application_number": f"{ number }-{ i }" } for i in range(count) ] }
+
+
+def test_iter_record_batches_splits_long_child_lists():
+    records = [ _patents("1", 5), _patents("2", 0), _patents("3", 2) ]
+    batches = list(script.iter_record_batches(PATENT, records, 3))
+
+    sizes = [ sum(len(r["patent"]) for r in batch) for batch in batches ]
+    assert sizes == [ 3, 3, 1 ]
+    numbers = [ p["application_number"] for batch in batches for r in batch for p in r["patent"] ]
+    assert numbers == [ "1-0", "1-1", "1-2", "1-3", "1-4", "3-0", "3-1" ]
+    # The input records are not modified
+    assert len(records[0]["patent"]) == 5
+
+
+def test_iter_record_batches_nested_record_path():
+    record = {
+        "corporate_number": "1",
+        "finance": { "accounting_standards": "JP", "management_index": [ { "fiscal_period": str(y) } for y in range(4) ] }
+    }
+    batches = list(script.iter_record_batches(FINANCE, [ record ], 3))
+
+    assert [ len(b[0]["finance"]["management_index"]) for b in batches ] == [ 3, 1 ]
+    assert all(b[0]["finance"]["accounting_standards"] == "JP" for b in batches)
+    assert len(record["finance"]["management_index"]) == 4
+
+
+def test_iter_record_batches_without_record_path_counts_records():
+    records = [ { "corporate_number": str(i) } for i in range(5) ]
+    batches = list(script.iter_record_batches("corporate_basic_information_gbizinfo", records, 2))
+
+    assert [ len(b) for b in batches ] == [ 2, 2, 1 ]
+
+
+@pytest.mark.parametrize("max_rows", [ 0, -1 ])
+def test_iter_record_batches_rejects_non_positive_sizes(max_rows):
+    with pytest.raises(ValueError):
+        list(script.iter_record_batches(PATENT, [ _patents("1", 2) ], max_rows))
+
+
+def test_iter_gbiz_frames_matches_parse_gbiz_table():
+    raw_json = { "hojin-infos": [ _patents("1", 5), _patents("2", 3) ] }
+    frames = list(script.iter_gbiz_frames(PATENT, raw_json, max_rows=2))
+
+    assert [ len(f) for f in frames ] == [ 2, 2, 2, 2 ]
+    pd.testing.assert_frame_equal(pd.concat(frames, ignore_index=True), script.parse_gbiz_table(PATENT, raw_json))
+
+
+class FakeDLQ:
+
+    def __init__(self, entries=()):
+        self.entries = list(entries)
+        self.settled = None
+
+    def load(self, tables=None):
+        return self.entries
+
+    def settle(self, succeeded, failed):
+        self.settled = (succeeded, failed)
+        return len(failed)
+
+
+@pytest.fixture
+def batch_sizes(monkeypatch):
+    sizes = []
+
+    def load_page(engine, table_name, raw_json, *args, batch_rows=script.MAX_BATCH_ROWS, **kwargs):
+        sizes.append(batch_rows)
+        return 1, 0, 1
+
+    monkeypatch.setattr(script, "load_page", load_page)
+    return sizes
+
+
+def test_record_fallback_keeps_the_batch_size(batch_sizes):
+    raw_json = { "hojin-infos": [ _patents("1", 3), _patents("2", 3) ] }
+    script.load_records_individually(None, "/patent", PATENT, "20250901", "20250930", 1, raw_json, FakeDLQ(), batch_rows=2)
+
+    # Corporations split across batches are retried piece by piece
+    assert batch_sizes == [ 2, 2, 2, 2 ]
+
+
+def test_retry_dlq_keeps_the_batch_size(batch_sizes):
+    entry = { "id": 1, "kind": "record", "table": PATENT, "endpoint": "/patent", "from": "20250901", "to": "20250930",
+              "page": 1, "error": "", "attempts": 1, "payload": _patents("1", 3) }
+    dlq = FakeDLQ([ entry ])
+    results = script.retry_dead_letters(None, dlq, batch_rows=2)
+
+    assert batch_sizes == [ 2 ]
+    assert results == { PATENT: (1, 0, 1, 0) }
+    assert dlq.settled == ([ 1 ], {})
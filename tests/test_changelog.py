@@ -0,0 +1,19 @@
+import re
+
+import changelog
+
+
+def test_new_run_id_is_unique_and_sortable_by_time():
+    ids = { changelog.new_run_id() for _ in range(50) }
+
+    assert len(ids) == 50
+    assert all(re.fullmatch(r"\d{8}T\d{6}-[0-9a-f]{8}", i) for i in ids)
+
+
+def test_append_changes_sql_logs_the_conflict_key():
+    sql = changelog.append_changes_sql([ "corporate_number", "fiscal_period" ])
+
+    assert f"INSERT INTO { changelog.CHANGELOG_TABLE } (run_id, table_name, corporate_number, pk, op)" in sql
+    assert "jsonb_build_object('corporate_number', \"corporate_number\", 'fiscal_period', \"fiscal_period\")" in sql
+    assert "SELECT :run_id, :table_name" in sql
+    assert "FROM upserted" in sql and "RETURNING (op = 'insert') AS is_insert" in sql
@@ -0,0 +1,119 @@
+import argparse
+
+import pytest
+
+import script
+
+PATENT = "patent_information_gbizinfo"
+AWARD = "award_information_gbizinfo"
+FINANCE = "financial_information_gbizinfo"
+
+
+def parse(*argv):
+    return script.build_parser().parse_args(argv)
+
+
+def test_resolve_tables_accepts_names_endpoints_and_prefixes():
+    assert script.resolve_tables([ "patent", "/finance", "corporate_basic", AWARD, "patent" ]) == [
+        PATENT, FINANCE, "corporate_basic_information_gbizinfo", AWARD
+    ]
+
+
+def test_resolve_tables_defaults_to_every_table():
+    assert script.resolve_tables(None) == list(script.ENDPOINTS_MAP.values())
+
+
+@pytest.mark.parametrize("name", [ "nope", "" ])
+def test_resolve_tables_rejects_unknown_or_ambiguous_names(name):
+    with pytest.raises(ValueError):
+        script.resolve_tables([ name ])
+
+
+def test_date_windows_covers_the_range_without_gaps():
+    assert list(script.date_windows("20250129", "20250203", 3)) == [
+        ("20250129", "20250131"), ("20250201", "20250203")
+    ]
+    assert list(script.date_windows("20250101", "20250101", 7)) == [ ("20250101", "20250101") ]
+    assert list(script.date_windows("20250102", "20250101", 7)) == []
+
+
+@pytest.mark.parametrize("days", [ 0, -3 ])
+def test_date_windows_rejects_non_positive_sizes(days):
+    with pytest.raises(ValueError):
+        list(script.date_windows("20250101", "20250110", days))
+
+
+def test_parse_date_accepts_both_formats():
+    assert script.parse_date("2025-09-01") == script.parse_date("20250901") == "20250901"
+    with pytest.raises(argparse.ArgumentTypeError):
+        script.parse_date("01/09/2025")
+
+
+def test_integer_option_types():
+    assert script.positive_int("3") == 3
+    assert script.non_negative_int("0") == 0
+    for value in ("0", "-1", "x"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            script.positive_int(value)
+    for value in ("-1", "x"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            script.non_negative_int(value)
+
+
+@pytest.mark.parametrize("argv", [
+    [ "sync", "--batch-rows", "0" ],
+    [ "sync", "--max-pages", "0" ],
+    [ "sync", "--workers", "0" ],
+    [ "sync", "--baseline-runs", "0" ],
+    [ "sync", "--changelog-retention-days", "0" ],
+    [ "sync", "--changelog-compact-days", "-1" ],
+    [ "sync", "--sink-buffer", "0" ],
+    [ "sync", "--sink-retries", "-1" ],
+    [ "sync", "--sink", "sqlite://#buffer=0" ],
+    [ "backfill", "--window-days", "0" ],
+    [ "reconcile", "--leaf-size", "0" ]
+])
+def test_parser_rejects_bad_counts(argv):
+    with pytest.raises(SystemExit):
+        parse(*argv)
+
+
+@pytest.mark.parametrize("argv", [
+    [ "retry-dlq", "--max-pages", "3" ],
+    [ "retry-dlq", "--time-budget", "5" ],
+    [ "retry-dlq", "--profile" ],
+    [ "retry-dlq", "--from", "20250101" ],
+    [ "replay", "--time-budget", "5" ],
+    [ "refresh-profile", "--tables", "patent" ],
+    [ "status", "--batch-rows", "10" ]
+])
+def test_commands_reject_options_they_would_ignore(argv):
+    with pytest.raises(SystemExit):
+        parse(*argv)
+
+
+def test_retry_dlq_options():
+    args = parse("retry-dlq", "--tables", "patent", "--batch-rows", "10", "--sink", "sqlite://")
+
+    assert (args.batch_rows, args.sinks, args.from_date, args.workers, args.profile) == (10, [ "sqlite://" ], None, 1, False)
+
+
+def test_main_resolves_tables_only_for_commands_that_take_them(monkeypatch):
+    seen = []
+    monkeypatch.setitem(script.COMMANDS, "refresh-profile", seen.append)
+    monkeypatch.setitem(script.COMMANDS, "status", seen.append)
+
+    script.main([ "refresh-profile", "--all" ])
+    script.main([ "status", "--tables", "patent" ])
+
+    assert "tables" not in vars(seen[0])
+    assert seen[1].tables == [ PATENT ]
+
+
+def test_main_defaults_to_sync(monkeypatch):
+    seen = []
+    monkeypatch.setitem(script.COMMANDS, "sync", seen.append)
+
+    script.main([ "--time-budget", "330" ])
+
+    assert seen[0].command == "sync" and seen[0].time_budget == 330
@@ -0,0 +1,113 @@
+import pytest
+
+import history
+import script
+
+PATENT = "patent_information_gbizinfo"
+
+
+class FakeDLQ:
+
+    def __init__(self):
+        self.entries = []
+        self.rows = []
+
+    def add(self, kind, table_name, endpoint_suffix, from_date, to_date, page, error, payload=None, attempts=1):
+        self.entries.append((kind, page, payload))
+
+    def add_rows(self, table_name, endpoint_suffix, from_date, to_date, page, rows, reasons):
+        self.rows.extend(reasons)
+
+
+class FakeFanOut:
+
+    def __init__(self):
+        self.rows = []
+
+    def __bool__(self):
+        return True
+
+    def submit(self, table_name, df, run_id):
+        self.rows.extend(df["application_number"])
+
+
+@pytest.fixture
+def api(monkeypatch):
+    failing = set()
+
+    def fetch_page(endpoint_suffix, table_name, from_date, to_date, page, stats=None):
+        if page in failing:
+            raise RuntimeError(f"Error 503 on { table_name } page { page }")
+        return { "total_pages": 3, "hojin-infos": [ { "corporate_number": "1" } ] }
+
+    monkeypatch.setattr(script, "fetch_page", fetch_page)
+    return failing
+
+
+def test_failed_first_page_dead_letters_the_window(api):
+    api.add(1)
+    dlq = FakeDLQ()
+    with pytest.raises(RuntimeError):
+        list(script.fetch_pages("/patent", PATENT, "20250901", "20250930", dlq=dlq))
+
+    assert dlq.entries == [ ("window", 1, None) ]
+
+
+def test_failed_later_page_is_dead_lettered_and_skipped(api):
+    api.add(2)
+    dlq = FakeDLQ()
+    pages = [ page for page, _ in script.fetch_pages("/patent", PATENT, "20250901", "20250930", dlq=dlq) ]
+
+    assert pages == [ 1, 3 ]
+    assert dlq.entries == [ ("page", 2, None) ]
+
+
+def test_failed_page_without_dlq_raises(api):
+    api.add(2)
+    with pytest.raises(RuntimeError):
+        list(script.fetch_pages("/patent", PATENT, "20250901", "20250930"))
+
+
+@pytest.fixture
+def flaky_upsert(monkeypatch):
+    """upsert_dataframe that fails once, on its third call."""
+    calls = []
+
+    def upsert_dataframe(engine, table_name, df, run_id=None):
+        calls.append(list(df["application_number"]))
+        if len(calls) == 3:
+            raise RuntimeError("deadlock detected")
+        return len(df), 0
+
+    monkeypatch.setattr(script, "upsert_dataframe", upsert_dataframe)
+    return calls
+
+
+def test_page_fallback_retries_only_unfinished_batches(flaky_upsert):
+    records = [
+        { "corporate_number": str(i), "patent": [ { "application_number": f"{ i }-{ j }" } for j in range(3) ] } for i in range(4)
+    ]
+    page = { "total_pages": 1, "hojin-infos": records }
+    dlq, fanout, stats = FakeDLQ(), FakeFanOut(), history.new_stats()
+
+    ins, upd = script.sync_endpoint(None, "/patent", PATENT, "20250901", "20250930", pages=[ (1, page) ], dlq=dlq,
+                                    stats=stats, batch_rows=4, fanout=fanout)
+
+    numbers = sorted(f"{ i }-{ j }" for i in range(4) for j in range(3))
+    # Batches 1 and 2 loaded; batch 3 failed and its records were retried one by one
+    assert flaky_upsert[3:] == [ [ "2-2" ], [ "3-0", "3-1", "3-2" ] ]
+    assert (ins, upd, stats["rows"]) == (12, 0, 12)
+    assert stats["quality"]["rows"] == 12
+    assert sorted(fanout.rows) == numbers
+    assert dlq.entries == []
+
+
+def test_rejected_rows_are_dead_lettered_once(flaky_upsert):
+    records = [ { "corporate_number": "1", "patent": [ { "application_number": n } for n in ("a", None, "b", "c", "d", "e") ] } ]
+    dlq, stats = FakeDLQ(), history.new_stats()
+
+    script.sync_endpoint(None, "/patent", PATENT, "20250901", "20250930", pages=[ (1, { "hojin-infos": records }) ],
+                         dlq=dlq, stats=stats, batch_rows=2)
+
+    assert dlq.rows == [ "empty required column(s): application_number" ]
+    assert stats["quality"]["rejected"] == 1
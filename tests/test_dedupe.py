@@ -0,0 +1,72 @@
+import pandas as pd
+
+import quality
+import script
+
+AWARD = "award_information_gbizinfo"
+
+
+def test_dedupe_keys_keeps_latest_update_then_last_position():
+    df = pd.DataFrame({
+        "corporate_number": [ "1", "1", "1", "2", "2" ],
+        "award_name": [ "a", "a", "a", "b", "b" ],
+        "last_updated_date": [ "2025-09-03", "2025-09-01", "2025-09-03", None, None ],
+        "row": [ 0, 1, 2, 3, 4 ]
+    })
+    out, collapsed = script.dedupe_keys(AWARD, df)
+
+    assert collapsed == 3
+    assert out["row"].tolist() == [ 2, 4 ]
+
+
+def test_dedupe_keys_keeps_every_row_with_a_null_key():
+    df = pd.DataFrame({
+        "corporate_number": [ "1", "1", None, None, "2" ],
+        "award_name": [ None, None, "a", "a", "b" ],
+        "row": [ 0, 1, 2, 3, 4 ]
+    })
+    out, collapsed = script.dedupe_keys(AWARD, df)
+
+    assert collapsed == 0
+    assert out["row"].tolist() == [ 0, 1, 2, 3, 4 ]
+
+
+def test_dedupe_keys_compares_keys_as_staged():
+    # Postgres matches '' but tells ' a ' from 'a'
+    df = pd.DataFrame({
+        "corporate_number": [ "1", "1", "1", "1" ],
+        "award_name": [ "a", " a ", "", "" ],
+        "row": [ 0, 1, 2, 3 ]
+    })
+    out, collapsed = script.dedupe_keys(AWARD, df)
+
+    assert collapsed == 1
+    assert out["row"].tolist() == [ 0, 1, 3 ]
+
+
+def test_dedupe_keys_with_a_non_default_index():
+    df = pd.DataFrame({
+        "corporate_number": [ "1", "1", None, "1" ],
+        "award_name": [ "a", "a", None, "a" ],
+        "row": [ 0, 1, 2, 3 ]
+    }, index=[ 10, 5, 7, 3 ])
+    out, collapsed = script.dedupe_keys(AWARD, df)
+
+    assert collapsed == 2
+    assert out.index.tolist() == [ 7, 3 ]
+    assert out["row"].tolist() == [ 2, 3 ]
+
+
+def test_dedupe_keys_agrees_with_the_quality_profile():
+    df = pd.DataFrame({ "corporate_number": [ "1", "1", "1", "2" ], "award_name": [ "a", "a", " a", "a" ] })
+    _, collapsed = script.dedupe_keys(AWARD, df)
+
+    assert collapsed == quality.profile(AWARD, df)["duplicates"] == 1
+
+
+def test_dedupe_keys_without_key_columns_returns_the_frame():
+    df = pd.DataFrame({ "corporate_number": [ "1", "1" ] })
+    out, collapsed = script.dedupe_keys(AWARD, df)
+
+    assert collapsed == 0
+    assert out is df
@@ -0,0 +1,35 @@
+import history
+
+
+def row(table, rows, duration):
+    return { "table": table, "rows": rows, "duration": duration }
+
+
+def test_throughput():
+    assert history.throughput(row("t", 500, 2.0)) == 250
+    assert history.throughput(row("t", 500, 0)) is None
+    assert history.throughput({ "table": "t" }) is None
+
+
+def test_flag_regressions():
+    report = [ row("slow", 1000, 10.0), row("fine", 1000, 1.0), row("small", 10, 10.0), row("new", 1000, 1.0) ]
+    baselines = { "slow": 200.0, "fine": 900.0, "small": 200.0 }
+
+    assert history.flag_regressions(report, baselines, threshold=0.3) == [ "slow" ]
+    slow, fine, small, new = report
+    assert slow["regressed"] and round(slow["rps_change"], 2) == -0.5
+    assert not fine["regressed"] and fine["rps_change"] > 0
+    # Too few rows, or no history yet: no comparison
+    assert small["rps_change"] is None and new["baseline_rps"] is None
+
+
+def test_timed_adds_up_stage_seconds():
+    stats = history.new_stats()
+    with history.timed(stats, "parse"):
+        pass
+    with history.timed(stats, "parse"):
+        pass
+    with history.timed(None, "parse"):
+        pass
+
+    assert list(stats["stage_seconds"]) == [ "parse" ] and stats["stage_seconds"]["parse"] >= 0
@@ -0,0 +1,50 @@
+import pandas as pd
+
+import identity
+import script
+
+AWARD = "award_information_gbizinfo"
+
+
+def test_remember_keeps_one_entry_per_corporation():
+    cache = identity.IdentityCache()
+    cache.remember([
+        { "corporate_number": "1", "name": "A", "location": "Tokyo" },
+        { "corporate_number": "1", "name": "A2", "location": "Osaka" },
+        { "corporate_number": "2" },
+        { "name": "no number" }
+    ])
+
+    assert len(cache) == 1
+    assert cache.values["name"] == { "1": "A2" } and cache.values["location"] == { "1": "Osaka" }
+
+
+def test_attach_maps_identity_columns():
+    cache = identity.IdentityCache()
+    cache.remember([ { "corporate_number": "1", "name": "A", "location": "Tokyo" } ])
+    df = pd.DataFrame({ "corporate_number": [ "1", "1", "9" ], "award_name": [ "x", "y", "z" ] }, index=[ 4, 5, 6 ])
+    out = cache.attach(AWARD, df)
+
+    for col in ("corporate_name", "award_corporate_name"):
+        assert out[col].iloc[:2].tolist() == [ "A", "A" ] and pd.isna(out[col].iloc[2])
+    assert out["headquarters_address"].iloc[:2].tolist() == [ "Tokyo", "Tokyo" ]
+    assert out.index.tolist() == [ 4, 5, 6 ]
+
+
+def test_attach_without_corporate_number_returns_the_frame():
+    df = pd.DataFrame({ "award_name": [ "x" ] })
+
+    assert identity.IdentityCache().attach(AWARD, df) is df
+
+
+def test_cached_parse_matches_meta_parse():
+    records = [
+        { "corporate_number": "1", "name": "A", "location": "Tokyo", "commendation": [ { "title": "x" }, { "title": "y" } ] },
+        { "corporate_number": "2", "name": "B", "location": "Kyoto", "commendation": [ { "title": "z" } ] }
+    ]
+    plain = script.parse_gbiz_table(AWARD, { "hojin-infos": records })
+    cache = identity.IdentityCache()
+    frames = [ cache.attach(AWARD, df) for df in script.iter_gbiz_frames(AWARD, { "hojin-infos": records }, identity=cache) ]
+    cached = pd.concat(frames, ignore_index=True)
+
+    pd.testing.assert_frame_equal(cached[plain.columns], plain)
@@ -0,0 +1,41 @@
+import os
+import tracemalloc
+
+import profiling
+
+
+def test_null_profiler_is_a_no_op():
+    profiler = profiling.make_profiler(False, "unused")
+
+    with profiler.table("t"), profiler.stage("t", "parse"):
+        pass
+    assert profiler.stop() == []
+
+
+def test_sync_profiler_reports_per_stage_and_per_table(tmp_path, monkeypatch):
+    snapshots = []
+    take_snapshot = tracemalloc.take_snapshot
+    monkeypatch.setattr(tracemalloc, "take_snapshot", lambda: snapshots.append(1) or take_snapshot())
+
+    profiler = profiling.make_profiler(True, str(tmp_path))
+    profiler.start()
+    with profiler.table("t"):
+        for _ in range(5):
+            with profiler.stage("t", "parse"):
+                kept = [ bytearray(1024) for _ in range(100) ]
+            with profiler.stage("t", "upsert"):
+                pass
+    written = profiler.stop()
+
+    # Two snapshots per table, none per stage call
+    assert len(snapshots) == 2
+    assert [ (key, kind) for key, kind, _ in written ] == [
+        (("t", "parse"), "pstats"), (("t", "parse"), "collapsed stacks"),
+        (("t", "upsert"), "pstats"), (("t", "upsert"), "collapsed stacks"),
+        (("t", "all stages"), "top allocations")
+    ]
+    assert all(os.path.exists(path) for _, _, path in written)
+    report = open(tmp_path / "t.alloc.txt", encoding="utf-8").read()
+    assert "# parse: wall time" in report and "test_profiling.py" in report
+    assert profiler.peaks[("t", "parse")] >= 100 * 1024
+    del kept
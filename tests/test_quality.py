@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+import quality
+
+BASIC = "corporate_basic_information_gbizinfo"
+AWARD = "award_information_gbizinfo"
+
+
+def test_check_rejects_rows_with_empty_required_columns():
+    df = pd.DataFrame({
+        "corporate_number": [ "1", "2", None, "4" ],
+        "award_name": [ "a", "", "c", None ]
+    }, index=[ 7, 8, 9, 10 ])
+    stats = quality.new_stats()
+    valid, rejected, reasons = quality.check(AWARD, df, stats)
+
+    assert valid.index.tolist() == [ 7 ]
+    assert rejected.index.tolist() == [ 8, 9, 10 ]
+    assert reasons.tolist() == [
+        "empty required column(s): award_name",
+        "empty required column(s): corporate_number",
+        "empty required column(s): award_name"
+    ]
+    assert stats["rejected"] == 3 and stats["rows"] == 4
+
+
+def test_check_missing_required_column_rejects_every_row():
+    df = pd.DataFrame({ "corporate_number": [ "1", "2" ] })
+    valid, rejected, reasons = quality.check(AWARD, df)
+
+    assert valid.empty and len(rejected) == 2
+
+
+def test_check_fails_a_batch_over_the_reject_limit():
+    df = pd.DataFrame({ "corporate_number": [ "1", "2", "3" ], "corporate_name": [ "a", "", None ] })
+    with pytest.raises(quality.DataQualityError):
+        quality.check(BASIC, df)
+
+
+def test_check_counts_repeated_keys_only_when_complete():
+    df = pd.DataFrame({ "corporate_number": [ "1", "1", None, None ], "award_name": [ "a", "a", "b", "b" ] })
+    stats = quality.new_stats()
+    quality.check(AWARD, df, stats)
+
+    assert stats["duplicates"] == 1
+
+
+def test_check_warns_instead_of_failing_by_default(monkeypatch, caplog):
+    monkeypatch.setitem(quality.QUALITY_RULES, AWARD, { "max_reject_rate": 0.1 })
+    df = pd.DataFrame({ "corporate_number": [ "1", "2" ], "award_name": [ "a", None ] })
+    valid, rejected, _ = quality.check(AWARD, df)
+
+    assert len(valid) == 1 and len(rejected) == 1
+    assert "1 of 2 rows rejected (50.00%, max 10.00%)" in caplog.text
+
+
+def test_summarize_lists_empty_and_missing_columns():
+    stats = quality.new_stats()
+    quality.check(AWARD, pd.DataFrame({ "corporate_number": [ "1", "2" ], "award_name": [ "a", "b" ],
+                                        "department": [ None, "x" ] }), stats)
+    never, rates = quality.summarize(AWARD, stats)
+
+    assert rates == [ ("department", 0.5) ]
+    assert "ministry_agency" in never and "award_name" not in never
@@ -0,0 +1,32 @@
+import pytest
+
+import reconcile
+import script
+
+
+def test_sample_prefixes_covers_every_bucket_by_default():
+    prefixes = reconcile.sample_prefixes()
+
+    assert len(prefixes) == 10 ** reconcile.SAMPLE_DEPTH
+    assert prefixes[0] == "0" * reconcile.SAMPLE_DEPTH and len(set(prefixes)) == len(prefixes)
+
+
+def test_sample_prefixes_is_reproducible_with_a_seed():
+    sample = reconcile.sample_prefixes(0.1, seed=7)
+
+    assert sample == reconcile.sample_prefixes(0.1, seed=7)
+    assert sample == sorted(sample)
+    assert len(sample) == round(10 ** reconcile.SAMPLE_DEPTH * 0.1)
+    assert len(reconcile.sample_prefixes(0.0001, seed=7)) == 1
+
+
+@pytest.mark.parametrize("option", [ [ "--from", "20250101" ], [ "--sink", "sqlite://" ], [ "--max-pages", "3" ], [ "--profile" ] ])
+def test_reconcile_rejects_options_it_would_ignore(option):
+    with pytest.raises(SystemExit):
+        script.build_parser().parse_args([ "reconcile", *option ])
+
+
+def test_reconcile_options():
+    args = script.build_parser().parse_args([ "reconcile", "--tables", "patent", "--batch-rows", "100", "--sample", "0.5" ])
+
+    assert (args.tables, args.batch_rows, args.sample, args.dry_run) == ([ "patent" ], 100, 0.5, False)
@@ -0,0 +1,129 @@
+import pytest
+
+import scheduler
+import script
+
+PATENT = "patent_information_gbizinfo"
+AWARD = "award_information_gbizinfo"
+
+
+def plan(pending, tables, windows):
+    schedule = scheduler.Scheduler(None, "run")
+    schedule.pending = lambda tables: pending
+    return schedule.plan(tables, windows)
+
+
+def test_order_tables_puts_priority_tables_first():
+    assert scheduler.order_tables([ "x", PATENT, "corporate_basic_information_gbizinfo" ])[0] == "corporate_basic_information_gbizinfo"
+    assert scheduler.order_tables([ "b", "a" ]) == [ "b", "a" ]
+
+
+def test_plan_without_progress():
+    assert plan([], [ PATENT ], [ ("20250901", "20250930") ]) == [ (("20250901", "20250930"), [ PATENT ], {}) ]
+
+
+def test_plan_resumes_the_same_window_and_other_pending_windows_first():
+    pending = [ (PATENT, "20250901", "20250930", 7), (AWARD, "20250801", "20250831", 3) ]
+    work = plan(pending, [ PATENT, AWARD ], [ ("20250901", "20250930") ])
+
+    assert work == [
+        (("20250801", "20250831"), [ AWARD ], { AWARD: 3 }),
+        (("20250901", "20250930"), scheduler.order_tables([ PATENT, AWARD ]), { PATENT: 7 })
+    ]
+
+
+def test_plan_continues_a_window_paused_on_an_earlier_day():
+    # The daily sync ran up to yesterday and paused; today's window starts on the same day
+    work = plan([ (PATENT, "20250901", "20261018", 212) ], [ PATENT, AWARD ], [ ("20250901", "20261019") ])
+
+    assert work == [
+        (("20250901", "20261018"), [ PATENT ], { PATENT: 212 }),
+        (("20250901", "20261019"), [ AWARD ], {}),
+        (("20261019", "20261019"), [ PATENT ], {})
+    ]
+
+
+def test_plan_follows_chained_pending_windows():
+    pending = [ (PATENT, "20250901", "20261017", 212), (PATENT, "20261018", "20261018", 4) ]
+    work = plan(pending, [ PATENT ], [ ("20250901", "20261019") ])
+
+    assert work == [
+        (("20250901", "20261017"), [ PATENT ], { PATENT: 212 }),
+        (("20261018", "20261018"), [ PATENT ], { PATENT: 4 }),
+        (("20261019", "20261019"), [ PATENT ], {})
+    ]
+
+
+def test_plan_pending_window_ending_later_replaces_the_planned_one():
+    work = plan([ (PATENT, "20250901", "20251031", 5) ], [ PATENT ], [ ("20250901", "20251015") ])
+
+    assert work == [ (("20250901", "20251031"), [ PATENT ], { PATENT: 5 }) ]
+
+
+def test_can_fetch_uses_page_estimates():
+    schedule = scheduler.Scheduler(None, "run", budget_seconds=100, margin_seconds=10, page_seconds={ PATENT: 50 })
+
+    assert schedule.can_fetch(PATENT)
+    schedule.page_seconds[PATENT] = 95
+    assert not schedule.can_fetch(PATENT)
+    assert scheduler.Scheduler(None, "run").can_fetch(PATENT)
+
+
+class FakeSchedule:
+
+    def __init__(self):
+        self.checkpoints = []
+        self.finished = []
+
+    def can_fetch(self, table_name):
+        return True
+
+    def checkpoint(self, table_name, from_date, to_date, next_page, paused=False):
+        self.checkpoints.append(next_page)
+
+    def done(self, table_name, from_date, to_date):
+        self.finished.append((table_name, from_date, to_date))
+
+
+@pytest.fixture
+def loaded_pages(monkeypatch):
+    loaded = []
+
+    def load_page(engine, table_name, raw_json, *args, **kwargs):
+        loaded.append(raw_json["page"])
+        return 1, 0, 1
+
+    monkeypatch.setattr(script, "load_page", load_page)
+    return loaded
+
+
+def pages(numbers, total_pages):
+    return [ (n, { "page": n, "total_pages": total_pages, "hojin-infos": [ {} ] }) for n in numbers ]
+
+
+def test_sync_endpoint_page_limit_keeps_the_window_open(loaded_pages):
+    schedule = FakeSchedule()
+    script.sync_endpoint(None, "/patent", PATENT, "20250901", "20250930", max_pages=3,
+                         pages=pages([ 200, 201, 202 ], 250), start_page=200, schedule=schedule)
+
+    assert loaded_pages == [ 200, 201, 202 ]
+    assert schedule.checkpoints[-1] == 203
+    assert schedule.finished == []
+
+
+def test_sync_endpoint_marks_the_window_done_after_its_last_page(loaded_pages):
+    schedule = FakeSchedule()
+    script.sync_endpoint(None, "/patent", PATENT, "20250901", "20250930", max_pages=3,
+                         pages=pages([ 1, 2 ], 2), schedule=schedule)
+
+    assert schedule.finished == [ (PATENT, "20250901", "20250930") ]
+
+
+def test_sync_endpoint_marks_the_window_done_on_a_page_without_records(loaded_pages):
+    schedule = FakeSchedule()
+    empty = (2, { "page": 2, "total_pages": 9, "hojin-infos": [] })
+    script.sync_endpoint(None, "/patent", PATENT, "20250901", "20250930", max_pages=5,
+                         pages=[ *pages([ 1 ], 9), empty ], schedule=schedule)
+
+    assert loaded_pages == [ 1 ]
+    assert schedule.finished == [ (PATENT, "20250901", "20250930") ]
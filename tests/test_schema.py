@@ -0,0 +1,41 @@
+import schema
+
+PATENT = "patent_information_gbizinfo"
+FINANCE = "financial_information_gbizinfo"
+
+
+def test_conflict_and_index_keys():
+    assert schema.conflict_key(FINANCE) == [ "corporate_number", "fiscal_period" ]
+    assert schema.conflict_key("corporate_basic_information_gbizinfo") == [ "corporate_number" ]
+    assert schema.index_key(PATENT, partitioned=True) == [ "corporate_number", "application_number", "partition_date" ]
+    assert schema.index_key(PATENT, partitioned=False) == [ "corporate_number", "application_number" ]
+
+
+def test_table_columns_are_unique_and_include_derived_columns():
+    cols = schema.table_columns(FINANCE)
+
+    assert len(cols) == len(set(cols))
+    assert cols.index("corporate_number") < cols.index("net_sales_yen")
+
+
+def test_cast_expr_only_casts_typed_columns():
+    assert schema.cast_expr(FINANCE, "net_sales") == '"net_sales"'
+    assert schema.cast_expr(FINANCE, "net_sales_yen") == 'CAST(NULLIF("net_sales_yen"::text, \'\') AS NUMERIC) AS "net_sales_yen"'
+
+
+def test_partitioned_tables_use_the_derived_partition_date():
+    sql = schema._create_table_sql(PATENT)
+
+    assert '"partition_date" DATE NOT NULL' in sql
+    assert sql.endswith('PARTITION BY RANGE ("partition_date")')
+    assert "PARTITION BY" not in schema._create_table_sql(FINANCE)
+    assert schema.partition_date_expr(PATENT, "s", "o") == 'COALESCE(s."application_date", o."application_date", DATE \'1900-01-01\')'
+
+
+def test_conflict_index_covers_the_index_key():
+    assert schema._create_conflict_index_sql(PATENT, partitioned=True).endswith(
+        'ON patent_information_gbizinfo ("corporate_number", "application_number", "partition_date")'
+    )
+    assert schema._create_conflict_index_sql(FINANCE, partitioned=False).endswith(
+        'ON financial_information_gbizinfo ("corporate_number", "fiscal_period")'
+    )
@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+import sinks
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(sinks, "RETRY_BACKOFF_SECONDS", 0)
+
+
+class FakeDLQ:
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, kind, table_name, *args, payload=None, **kwargs):
+        self.entries.append((kind, table_name, payload))
+
+
+def test_parse_sink_defaults_and_fragment():
+    assert sinks.parse_sink("sqlite://") == ("sqlite://", { "retries": 3, "buffer": 8, "workers": 1 })
+    assert sinks.parse_sink("sqlite://#retries=0&workers=2", buffer=4) == (
+        "sqlite://", { "retries": 0, "buffer": 4, "workers": 2 }
+    )
+
+
+@pytest.mark.parametrize("spec", [
+    "sqlite://#retries=-1", "sqlite://#buffer=0", "sqlite://#workers=0", "sqlite://#bogus=1", "sqlite://#retries=x"
+])
+def test_parse_sink_rejects_bad_options(spec):
+    with pytest.raises(ValueError):
+        sinks.parse_sink(spec)
+
+
+@pytest.mark.parametrize("options", [ { "retries": -1 }, { "buffer": 0 }, { "workers": 0 } ])
+def test_sink_rejects_bad_options(options):
+    with pytest.raises(ValueError):
+        sinks.Sink("sqlite://", lambda *a: (0, 0), **options)
+
+
+def test_sink_writes_batches_of_a_table_in_order():
+    written = []
+
+    def write(engine, table_name, df, run_id):
+        written.append((table_name, df["n"].tolist(), run_id))
+        return len(df), 0
+
+    sink = sinks.Sink("sqlite://", write, buffer=1, workers=2)
+    for n in range(5):
+        sink.submit("t", pd.DataFrame({ "n": [ n, n ] }), "run")
+    sink.close()
+
+    assert written == [ ("t", [ n, n ], "run") for n in range(5) ]
+    assert sink.stats["batches"] == 5 and sink.stats["rows"] == 10 and sink.stats["inserted"] == 10
+
+
+def test_sink_retries_then_dead_letters_the_batch():
+    calls = []
+
+    def write(engine, table_name, df, run_id):
+        calls.append(table_name)
+        raise RuntimeError("target is down")
+
+    dlq = FakeDLQ()
+    sink = sinks.Sink("sqlite://", write, retries=2, buffer=1, dlq=dlq)
+    sink.submit("t", pd.DataFrame({ "n": [ 1, None ] }), "run")
+    sink.close()
+
+    assert len(calls) == 3
+    assert sink.stats["failed"] == 1 and sink.stats["retries"] == 2 and sink.stats["batches"] == 0
+    assert dlq.entries == [ ("sink", "t", { "target": "sqlite://", "rows": [ { "n": 1.0 }, { "n": None } ] }) ]
+
+
+def test_sink_without_retries_keeps_running():
+    def write(engine, table_name, df, run_id):
+        raise RuntimeError("target is down")
+
+    sink = sinks.Sink("sqlite://", write, retries=0, buffer=1)
+    for n in range(3):
+        sink.submit("t", pd.DataFrame({ "n": [ n ] }), "run")
+    sink.close()
+
+    assert sink.stats["failed"] == 3
+
+
+def test_fanout_find_and_disable():
+    fanout = sinks.FanOut([ "sqlite://", "sqlite:///sink.db" ], lambda *a: (0, 0))
+    sink = fanout.find("sqlite://")
+
+    fanout.disable(sink)
+
+    assert fanout.find("sqlite://") is None
+    assert [ s.name for s in fanout.sinks ] == [ "sqlite:///sink.db" ]
+    fanout.close()
+    assert not sinks.FanOut([], lambda *a: (0, 0))
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+import script
+
+FINANCE = "financial_information_gbizinfo"
+
+
+def test_normalize_yen_units():
+    df = pd.DataFrame({
+        "net_sales": [ "1,200", "3", "abc", "5", None ],
+        "net_sales_unit": [ "千円", " 百万円 ", "円", "ドル", "円" ]
+    })
+    out = script.normalize_yen_units(df, [ "net_sales", "total_assets" ])
+
+    expected = [ 1_200_000, 3_000_000, np.nan, np.nan, np.nan ]
+    np.testing.assert_array_equal(out["net_sales_yen"].to_numpy(), expected)
+    assert "total_assets_yen" not in out.columns
+
+
+def test_normalize_yen_units_without_unit_column_gives_nan():
+    out = script.normalize_yen_units(pd.DataFrame({ "net_sales": [ "10" ] }), [ "net_sales" ])
+
+    assert out["net_sales_yen"].isna().all()
+
+
+def test_normalize_yen_units_empty_frame():
+    df = pd.DataFrame({ "net_sales": pd.Series(dtype=object), "net_sales_unit": pd.Series(dtype=object) })
+    out = script.normalize_yen_units(df, [ "net_sales" ])
+
+    assert out.empty and "net_sales_yen" in out.columns
+
+
+def test_finance_pages_get_yen_columns():
+    record = { "corporate_number": "1", "finance": { "management_index": [
+        { "fiscal_period": "2024", "net_sales_summary_of_business_results": "12",
+          "net_sales_summary_of_business_results_unit_ref": "億円" }
+    ] } }
+    df = script.parse_gbiz_table(FINANCE, { "hojin-infos": [ record ] })
+
+    assert df["net_sales_yen"].tolist() == [ 1_200_000_000 ]